@@ -37,9 +37,10 @@ def init_database_schema():
         with open(script_path, 'r', encoding='utf-8') as f:
             sql_script = f.read()
         
-        # Thực thi script
-        db.cursor.execute(sql_script)
-        db.conn.commit()
+        # Thực thi script trong một transaction (kết nối mặc định ở chế độ autocommit,
+        # không cần commit() riêng)
+        with db.transaction():
+            db.cursor.execute(sql_script)
         
         logger.info(f"Đã khởi tạo schema database thành công từ script: {script_path}")
         return True
@@ -48,6 +48,10 @@ class TikTokCommentCrawler:
         # Biến để kiểm soát quá trình crawl
         self.crawl_paused = False
         self.captcha_callback = None
+        
+        # Manifest avatar (url -> etag, path), được tải khi cần và lưu khi đóng crawler
+        self.avatar_manifest_path = Path("data/avatars/avatars.json")
+        self._avatar_manifest = None
 
         
     def on_captcha_detected(self, captcha_element):
@@ -637,6 +641,9 @@ class TikTokCommentCrawler:
                 (By.XPATH, "//div[contains(@class, 'DivCommentListContainer')]")
             ))
             
+            # Theo dõi các comments mới được thêm vào container
+            self._install_comment_observer(comments_section)
+            
             # Cuộn xuống để tải thêm comments
             comments_loaded = 0
             last_comments_count = 0
@@ -710,8 +717,8 @@ class TikTokCommentCrawler:
                 # Hoặc cuộn phần tử comments container
                 self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", comments_section)
                 
-                # Đợi lâu hơn để trang tải
-                time.sleep(scroll_pause_time * 1.5)  # Tăng thời gian chờ để đảm bảo trang tải đầy đủ
+                # Đợi comments mới xuất hiện, tối đa bằng thời gian chờ cũ
+                self._wait_for_new_comments(scroll_pause_time * 1.5)
                 
                 # Kiểm tra nếu đã đạt đủ số lượng comments cần thiết (chỉ trong chế độ có giới hạn)
                 if not unlimited and comments_loaded >= max_comments:
@@ -739,6 +746,44 @@ class TikTokCommentCrawler:
                 progress_callback(0, f"Lỗi: {str(e)}")
             return False
 
+    def _install_comment_observer(self, comments_section) -> None:
+        """
+        Gắn MutationObserver vào container comments để đánh dấu khi có comments mới
+        
+        Args:
+            comments_section: Phần tử container chứa danh sách comments
+        """
+        self.driver.execute_script("""
+            if (window.__commentObserver) { window.__commentObserver.disconnect(); }
+            window.__newBatch = 0;
+            window.__commentObserver = new MutationObserver(muts => {
+                for (const m of muts) {
+                    if (m.addedNodes.length) { window.__newBatch = (window.__newBatch || 0) + 1; }
+                }
+            });
+            window.__commentObserver.observe(arguments[0], {childList: true, subtree: true});
+        """, comments_section)
+    
+    def _wait_for_new_comments(self, timeout: float) -> bool:
+        """
+        Đợi cho đến khi MutationObserver ghi nhận comments mới
+        
+        Args:
+            timeout (float): Thời gian chờ tối đa (giây)
+            
+        Returns:
+            bool: True nếu có comments mới, False nếu hết thời gian chờ
+        """
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(
+                lambda d: d.execute_script(
+                    "const n = window.__newBatch || 0; window.__newBatch = 0; return n > 0;"
+                )
+            )
+            return True
+        except TimeoutException:
+            return False
+
     def _open_all_replies(self) -> bool:
         """
         Mở tất cả các replies
@@ -801,10 +846,41 @@ class TikTokCommentCrawler:
             logger.warning(f"Lỗi khi mở tất cả các replies: {e}")
             return False
 
+    def _load_avatar_manifest(self) -> Dict[str, Dict[str, str]]:
+        """
+        Tải manifest avatar từ file JSON (chỉ tải một lần cho mỗi crawler)
+        
+        Returns:
+            dict: Ánh xạ URL avatar (không gồm query string) -> {"etag", "path"}
+        """
+        if self._avatar_manifest is None:
+            self._avatar_manifest = {}
+            if self.avatar_manifest_path.exists():
+                try:
+                    with open(self.avatar_manifest_path, 'r', encoding='utf-8') as f:
+                        self._avatar_manifest = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Không thể đọc manifest avatar: {e}")
+        return self._avatar_manifest
+    
+    def _save_avatar_manifest(self) -> None:
+        """Lưu manifest avatar xuống file JSON"""
+        if not self._avatar_manifest:
+            return
+        try:
+            self.avatar_manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.avatar_manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(self._avatar_manifest, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Không thể lưu manifest avatar: {e}")
+
     def download_avatars(self, comments_data: List[Dict[str, Any]]) -> None:
         """
         Tải xuống avatar từ URL và lưu vào thư mục local
         
+        Avatar đã tải được ghi vào manifest kèm ETag; lần sau gửi If-None-Match để
+        CDN trả về 304 khi nội dung không đổi, kể cả khi query string của URL thay đổi.
+        
         Args:
             comments_data (list): Danh sách các comment
         """
@@ -818,6 +894,9 @@ class TikTokCommentCrawler:
             from urllib.parse import urlparse
             import hashlib
             
+            manifest = self._load_avatar_manifest()
+            session = requests.Session()
+            
             for comment in comments_data:
                 avatar_url = comment.get('avatar_url', '')
                 if not avatar_url:
@@ -835,15 +914,31 @@ class TikTokCommentCrawler:
                         comment['avatar_path'] = str(avatar_path)
                         continue
                     
+                    # URL avatar TikTok có chữ ký thay đổi theo thời gian, nên bỏ query string làm khóa
+                    parsed_url = urlparse(avatar_url)
+                    manifest_key = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}"
+                    cached = manifest.get(manifest_key)
+                    
+                    headers = {}
+                    if cached and cached.get('etag') and Path(cached.get('path', '')).exists():
+                        headers['If-None-Match'] = cached['etag']
+                    
                     # Tải avatar
-                    response = requests.get(avatar_url, timeout=10)
-                    if response.status_code == 200:
+                    response = session.get(avatar_url, headers=headers, timeout=10)
+                    if response.status_code == 304:
+                        # Nội dung không đổi, dùng lại file đã tải
+                        comment['avatar_path'] = cached['path']
+                    elif response.status_code == 200:
                         # Lưu avatar vào file
                         with open(avatar_path, 'wb') as f:
                             f.write(response.content)
                         
                         # Cập nhật đường dẫn avatar trong comment data
                         comment['avatar_path'] = str(avatar_path)
+                        manifest[manifest_key] = {
+                            'etag': response.headers.get('ETag', ''),
+                            'path': str(avatar_path)
+                        }
                         logger.info(f"Đã tải avatar cho {username}")
                     else:
                         logger.warning(f"Không thể tải avatar cho {username}: HTTP {response.status_code}")
@@ -851,6 +946,7 @@ class TikTokCommentCrawler:
                     logger.warning(f"Lỗi khi tải avatar cho {comment.get('username', 'unknown')}: {e}")
                     continue
             
+            session.close()
             logger.info(f"Hoàn thành việc tải avatars cho {len(comments_data)} comments")
         except Exception as e:
             logger.error(f"Lỗi trong quá trình tải avatars: {e}")
@@ -1218,6 +1314,9 @@ class TikTokCommentCrawler:
         # Dừng captcha monitor trước khi đóng trình duyệt
         if hasattr(self, 'captcha_monitor'):
             self.captcha_monitor.stop()
+        
+        # Lưu manifest avatar để lần crawl sau dùng lại
+        self._save_avatar_manifest()
             
         if self.driver:
             self.driver.quit()
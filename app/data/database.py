@@ -1,21 +1,382 @@
 import os
+import atexit
+import hashlib
+import io
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
 import psycopg2
+import psycopg2.errors
 from psycopg2 import sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_batch, execute_values, RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+import numpy as np
 import pandas as pd
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
 from pathlib import Path
+from uuid import uuid4
 import logging
+from app.data.processor import parse_counts
 
 logger = logging.getLogger(__name__)
 
+# Thứ tự cột khi thêm bình luận
+_COMMENT_COLUMNS = (
+    'video_id', 'username', 'comment_text', 'likes', 'comment_time', 'replies_count',
+    'is_reply', 'parent_comment_id', 'avatar_url', 'avatar_path', 'crawled_at'
+)
+
+# Kiểu trong catalog (regtype) -> khóa của _BINARY_ENCODERS khi COPY ở định dạng binary
+_COPY_TYPE_NAMES = {
+    'smallint': 'int2',
+    'integer': 'int4',
+    'bigint': 'int8',
+    'boolean': 'bool',
+    'text': 'text',
+    'character varying': 'text',
+    'timestamp without time zone': 'timestamp',
+}
+
+# Giới hạn của cột INTEGER (likes, replies_count): "3B" lượt thích vượt quá int4
+_INT4_MAX = 2 ** 31 - 1
+
+# Header (chữ ký 11 byte, flags, độ dài phần mở rộng) và trailer của COPY ... (FORMAT BINARY)
+_PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+_PGCOPY_TRAILER = struct.pack('>h', -1)
+_PGCOPY_NULL = struct.pack('>i', -1)
+_PG_EPOCH = datetime(2000, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Thứ tự trang của query_comments; bình luận không có crawled_at (NULL) nằm cuối
+_COMMENTS_ORDER = " ORDER BY crawled_at DESC NULLS LAST, comment_id DESC"
+
+
+def _comments_query(by_video: bool, by_user: bool, seek: Optional[str]) -> str:
+    """
+    Dựng câu truy vấn của query_comments theo bộ lọc và kiểu phân trang keyset
+    
+    So sánh (crawled_at, comment_id) < (NULL, id) cho ra NULL, nên khóa của trang trước có
+    crawled_at NULL ('null') chỉ seek trong phần các dòng NULL ở cuối. Với khóa có thời gian
+    ('value'), trang tiếp theo gồm các dòng nhỏ hơn khóa rồi đến các dòng NULL; hai phần được
+    seek riêng trên chỉ mục và ghép bằng UNION ALL thay vì một điều kiện OR phải lọc từng dòng.
+    
+    Args:
+        by_video (bool): Lọc theo video_id
+        by_user (bool): Lọc theo username
+        seek (str): None (phân trang bằng OFFSET), 'value' hoặc 'null'
+        
+    Returns:
+        str: Câu truy vấn với tham số %s
+    """
+    select = ("SELECT * FROM comments WHERE 1=1"
+              + (" AND video_id = %s" if by_video else "")
+              + (" AND username LIKE %s" if by_user else ""))
+    if seek is None:
+        return select + _COMMENTS_ORDER + " LIMIT %s OFFSET %s"
+    if seek == 'null':
+        return select + " AND crawled_at IS NULL AND comment_id < %s" + _COMMENTS_ORDER + " LIMIT %s"
+    return (
+        "SELECT * FROM ("
+        + "(" + select + " AND (crawled_at, comment_id) < (%s, %s)" + _COMMENTS_ORDER + " LIMIT %s)"
+        + " UNION ALL "
+        + "(" + select + " AND crawled_at IS NULL" + _COMMENTS_ORDER + " LIMIT %s)"
+        + ") page" + _COMMENTS_ORDER + " LIMIT %s"
+    )
+
+
+# Các biến thể câu truy vấn của query_comments theo (lọc video_id, lọc username, phân trang keyset)
+_QUERY_COMMENTS_VARIANTS = {
+    (by_video, by_user, seek): _comments_query(by_video, by_user, seek)
+    for by_video in (False, True)
+    for by_user in (False, True)
+    for seek in (None, 'value', 'null')
+}
+
+
+@lru_cache(maxsize=None)
+def _create_database_sql(database: str) -> sql.Composed:
+    """Câu lệnh CREATE DATABASE đã được compose sẵn cho tên database"""
+    return sql.SQL("CREATE DATABASE {}").format(sql.Identifier(database))
+
+
+@lru_cache(maxsize=None)
+def _insert_sql(table: str, columns: tuple) -> sql.Composed:
+    """Câu lệnh INSERT ... VALUES %s đã được compose sẵn cho bảng và danh sách cột"""
+    return sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+
+
+@lru_cache(maxsize=None)
+def _copy_sql(table: str, columns: tuple = None, fmt: str = 'text') -> sql.Composed:
+    """Câu lệnh COPY ... FROM STDIN đã được compose sẵn cho bảng (và danh sách cột)"""
+    if not columns:
+        return sql.SQL("COPY {} FROM STDIN WITH (FORMAT {})").format(
+            sql.Identifier(table), sql.SQL(fmt)
+        )
+    return sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT {})").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(fmt)
+    )
+
+
+# Kiểu COPY binary của các cột bảng tạm comments_staging (theo đúng thứ tự cột)
+_STAGING_COPY_TYPES = ('int4', 'text', 'text', 'int4', 'text', 'int4', 'bool', 'text', 'text', 'text', 'timestamp')
+_STAGING_CHUNK_SIZE = 10000
+
+
+# Các database (host, port, database) đã được create_tables xác nhận có đủ schema trong process
+_SCHEMA_READY = set()
+
+# Kiểu COPY binary của các cột bảng comments theo (host, port, database), đọc từ catalog
+# vì database tạo từ schema cũ dùng SERIAL/INTEGER cho comment_id thay vì BIGINT
+_COMMENT_COPY_TYPES: Dict[tuple, tuple] = {}
+
+# Số dòng tối thiểu để export_dataframe_to_postgres dùng bulk_load_comments
+# (COPY với kiểm tra khóa ngoại được tắt nếu có quyền)
+_BULK_LOAD_THRESHOLD = 50000
+
+# Cache kết quả get_database_stats theo (host, port, database): key -> (thời điểm, stats)
+_STATS_CACHE: Dict[tuple, tuple] = {}
+_STATS_TTL = 30.0
+
+# Pool kết nối dùng chung trong process, theo _pool_key (máy chủ, người dùng, mật khẩu, database)
+_POOLS: Dict[tuple, ThreadedConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+# Số kết nối đang được các connector mượn từ mỗi pool (đọc/ghi dưới _POOLS_LOCK)
+_POOLS_IN_USE: Dict[tuple, int] = {}
+
+# Thời gian tối đa (giây) chờ một kết nối rảnh khi pool đã dùng hết
+_POOL_WAIT_TIMEOUT = 10.0
+
+# Số kết nối rảnh pool giữ lại khi được trả về (psycopg2 đóng các kết nối vượt quá minconn
+# trong putconn), bằng số luồng mặc định của bulk_export_dataframes để các lần xuất song
+# song sau dùng lại kết nối (và các câu lệnh đã PREPARE trên đó) thay vì kết nối mới
+_POOL_MIN_IDLE = 4
+
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """
+    Kết nối vật lý trong pool, nhớ các câu lệnh đã PREPARE trên chính nó
+    
+    Câu lệnh PREPARE tồn tại theo phiên của kết nối, nên khi kết nối được lấy lại từ
+    pool không cần PREPARE lại hay truy vấn pg_prepared_statements.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+def _pool_key(host: str, port: int, user: str, password: str, database: str) -> tuple:
+    """
+    Khóa của pool trong _POOLS
+    
+    Gồm cả mật khẩu (dạng băm, không giữ mật khẩu gốc trong khóa) để connector dùng thông
+    tin đăng nhập mới không lấy lại pool đã mở bằng thông tin cũ.
+    """
+    password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest() if password else None
+    return (host, port, user, password_hash, database)
+
+
+def _get_pool(host: str, port: int, user: str, password: str, database: str,
+              maxconn: int = 16) -> ThreadedConnectionPool:
+    """
+    Lấy (hoặc tạo mới) pool kết nối cho database
+    
+    Pool mới mở sẵn min(_POOL_MIN_IDLE, maxconn) kết nối và giữ lại chừng ấy kết nối rảnh.
+    
+    Args:
+        host (str): Máy chủ PostgreSQL
+        port (int): Cổng PostgreSQL
+        user (str): Tên người dùng
+        password (str): Mật khẩu
+        database (str): Tên database
+        maxconn (int): Số kết nối tối đa trong pool
+        
+    Returns:
+        ThreadedConnectionPool: Pool kết nối
+    """
+    key = _pool_key(host, port, user, password, database)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool.closed:
+            pool = ThreadedConnectionPool(
+                minconn=min(_POOL_MIN_IDLE, maxconn),
+                maxconn=maxconn,
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                database=database,
+                connection_factory=_PooledConnection
+            )
+            _POOLS[key] = pool
+            _POOLS_IN_USE[key] = 0
+        return pool
+
+
+@atexit.register
+def _close_pools():
+    """Đóng tất cả kết nối trong các pool khi process kết thúc"""
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            if not pool.closed:
+                pool.closeall()
+        _POOLS.clear()
+        _POOLS_IN_USE.clear()
+
+
+def _to_bool(value: Any) -> bool:
+    """
+    Chuyển giá trị cờ (bool, chuỗi hoặc NaN từ DataFrame) sang bool
+    
+    Args:
+        value: Giá trị cần chuyển đổi
+        
+    Returns:
+        bool: Giá trị bool tương ứng, NaN/None được coi là False
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1')
+    # NaN != NaN
+    return value == value and bool(value)
+
+
+def _encode_text(value: Any) -> bytes:
+    data = str(value).encode('utf-8')
+    return struct.pack('>i', len(data)) + data
+
+
+def _encode_timestamp(value: datetime) -> bytes:
+    # timestamp without time zone: số micro giây kể từ 2000-01-01
+    return struct.pack('>iq', 8, (value.replace(tzinfo=None) - _PG_EPOCH) // _ONE_MICROSECOND)
+
+
+# Hàm mã hóa một giá trị khác NULL sang trường (độ dài + dữ liệu) của COPY binary
+_BINARY_ENCODERS = {
+    'int2': lambda value: struct.pack('>ih', 2, int(value)),
+    'int4': lambda value: struct.pack('>ii', 4, int(value)),
+    'int8': lambda value: struct.pack('>iq', 8, int(value)),
+    'bool': lambda value: struct.pack('>i?', 1, bool(value)),
+    'text': _encode_text,
+    'timestamp': _encode_timestamp,
+}
+
+
+def _pack_binary_copy(rows: List[tuple], types: tuple) -> bytes:
+    """
+    Đóng gói các dòng theo định dạng COPY binary của PostgreSQL
+    
+    Args:
+        rows (list): Danh sách các dòng (tuple) theo đúng thứ tự cột
+        types (tuple): Kiểu của từng cột (khóa của _BINARY_ENCODERS)
+        
+    Returns:
+        bytes: Dữ liệu gồm header, các dòng và trailer
+    """
+    encoders = [_BINARY_ENCODERS[t] for t in types]
+    field_count = struct.pack('>h', len(types))
+    parts = [_PGCOPY_HEADER]
+    append = parts.append
+    for row in rows:
+        append(field_count)
+        for encode, value in zip(encoders, row):
+            # NaN != NaN
+            if value is None or value != value:
+                append(_PGCOPY_NULL)
+            else:
+                append(encode(value))
+    append(_PGCOPY_TRAILER)
+    return b''.join(parts)
+
+
+# pandas >= 2.0 suy ra định dạng từ phần tử đầu tiên trừ khi dùng format='mixed';
+# các bản trước đó đọc từng giá trị riêng
+_MIXED_DATETIME_FORMAT = {'format': 'mixed'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+
+def _to_timestamps(values: pd.Series) -> pd.Series:
+    """
+    Chuyển cột thời gian sang datetime một lần cho toàn bộ cột
+    
+    Args:
+        values (Series): Cột thời gian (chuỗi hoặc datetime)
+        
+    Returns:
+        Series: Cột kiểu object chứa datetime, giá trị không hợp lệ là None
+    """
+    # Không cho pandas suy ra một định dạng chung từ phần tử đầu tiên: dữ liệu gộp từ nhiều
+    # lần thu thập có thể trộn nhiều định dạng, và các giá trị khác định dạng sẽ thành NaT
+    timestamps = pd.to_datetime(values, errors='coerce', **_MIXED_DATETIME_FORMAT)
+    lost = int(timestamps.isna().sum() - values.isna().sum())
+    if lost > 0:
+        logger.warning(f"Bỏ qua {lost} giá trị thời gian không đọc được (được lưu là NULL)")
+    return timestamps.astype(object).where(timestamps.notna(), None)
+
+
+# Các câu lệnh chạy theo từng dòng được PREPARE trên mỗi kết nối để PostgreSQL không phải
+# parse/plan lại mỗi lần gọi; các đường thêm hàng loạt dùng COPY hoặc INSERT nhiều dòng
+_PREPARED_STATEMENTS = {
+    'ups_video': """
+    PREPARE ups_video (text, text, text, text) AS
+    INSERT INTO videos (video_id, video_url, author, title)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (video_id) DO UPDATE SET
+        video_url = EXCLUDED.video_url,
+        author = EXCLUDED.author,
+        title = EXCLUDED.title,
+        crawled_at = CURRENT_TIMESTAMP
+    RETURNING (xmax = 0) AS inserted
+    """,
+    'ups_video_details': """
+    PREPARE ups_video_details (text, text, text, text, text, bigint, bigint, bigint, bigint, text, text, text[]) AS
+    INSERT INTO videos (
+        video_id, video_url, author, title, description,
+        views_count, likes_count, shares_count, comments_count,
+        post_time, music_name, tags
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+    ON CONFLICT (video_id) DO UPDATE SET
+        video_url = EXCLUDED.video_url,
+        author = COALESCE(EXCLUDED.author, videos.author),
+        title = COALESCE(EXCLUDED.title, videos.title),
+        description = COALESCE(EXCLUDED.description, videos.description),
+        views_count = COALESCE(EXCLUDED.views_count, videos.views_count),
+        likes_count = COALESCE(EXCLUDED.likes_count, videos.likes_count),
+        shares_count = COALESCE(EXCLUDED.shares_count, videos.shares_count),
+        comments_count = COALESCE(EXCLUDED.comments_count, videos.comments_count),
+        post_time = COALESCE(EXCLUDED.post_time, videos.post_time),
+        music_name = COALESCE(EXCLUDED.music_name, videos.music_name),
+        tags = COALESCE(EXCLUDED.tags, videos.tags),
+        crawled_at = CURRENT_TIMESTAMP
+    RETURNING (xmax = 0) AS inserted
+    """,
+}
+
+
 class PostgresConnector:
     """
     Kết nối và tương tác với PostgreSQL database
     """
+    # Connector được tạo cho mỗi thao tác (và mỗi luồng trong bulk_export_dataframes):
+    # __slots__ bỏ __dict__ riêng của từng instance
+    __slots__ = (
+        'host', 'port', 'user', 'password', 'database', 'pool_max',
+        'conn', 'cursor', '_pool', '_pool_key', '_in_transaction'
+    )
+    
     def __init__(self, host: str = "localhost", port: int = 5432, 
                  user: str = "postgres", password: str = None, 
-                 database: str = "tiktok_data"):
+                 database: str = "tiktok_data", pool_max: int = 16):
         """
         Khởi tạo kết nối PostgreSQL
         
@@ -25,14 +386,19 @@ class PostgresConnector:
             user (str): Tên người dùng
             password (str): Mật khẩu
             database (str): Tên database
+            pool_max (int): Số kết nối tối đa trong pool dùng chung
         """
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
+        self.pool_max = pool_max
         self.conn = None
         self.cursor = None
+        self._pool = None
+        self._pool_key = None
+        self._in_transaction = False
         
     def connect(self) -> bool:
         """
@@ -42,12 +408,13 @@ class PostgresConnector:
             bool: True nếu kết nối thành công, False nếu thất bại
         """
         try:
-            # Kết nối tới PostgreSQL server
+            # Kết nối tới PostgreSQL server qua maintenance database "postgres"
             self.conn = psycopg2.connect(
                 host=self.host,
                 port=self.port,
                 user=self.user,
-                password=self.password
+                password=self.password,
+                database="postgres"
             )
             self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
             self.cursor = self.conn.cursor()
@@ -63,8 +430,23 @@ class PostgresConnector:
         if self.cursor:
             self.cursor.close()
         if self.conn:
-            self.conn.close()
-            logger.info("Đã đóng kết nối PostgreSQL")
+            if self._pool is not None:
+                # Trả kết nối về pool thay vì đóng hẳn; kết nối đã hỏng thì bỏ đi
+                # để không bị tái sử dụng
+                broken = bool(self.conn.closed) or (
+                    self.conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+                )
+                with _POOLS_LOCK:
+                    _POOLS_IN_USE[self._pool_key] = max(0, _POOLS_IN_USE.get(self._pool_key, 0) - 1)
+                self._pool.putconn(self.conn, close=broken)
+                logger.debug("Đã trả kết nối PostgreSQL về pool")
+            else:
+                self.conn.close()
+                logger.info("Đã đóng kết nối PostgreSQL")
+        self.conn = None
+        self.cursor = None
+        self._pool = None
+        self._pool_key = None
     
     def create_database(self) -> bool:
         """
@@ -80,7 +462,7 @@ class PostgresConnector:
             
             if not exists:
                 # Tạo database mới
-                self.cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(self.database)))
+                self.cursor.execute(_create_database_sql(self.database))
                 logger.info(f"Đã tạo database: {self.database}")
             else:
                 logger.info(f"Database {self.database} đã tồn tại")
@@ -90,75 +472,344 @@ class PostgresConnector:
             logger.error(f"Lỗi khi tạo database: {e}")
             return False
     
+    def _acquire_connection(self):
+        """
+        Lấy kết nối đến database cụ thể từ pool dùng chung (ném lỗi nếu thất bại)
+        """
+        # Đóng kết nối hiện tại
+        self.close()
+        
+        # Lấy kết nối đến database cụ thể từ pool dùng chung
+        key = _pool_key(self.host, self.port, self.user, self.password, self.database)
+        pool = _get_pool(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            maxconn=self.pool_max
+        )
+        
+        # getconn không chờ mà ném PoolError ngay khi pool đã dùng hết (các lần chạy lại
+        # của Streamlit và bulk_export_dataframes dùng chung pool): thử lại trong giới hạn
+        # _POOL_WAIT_TIMEOUT giây
+        deadline = time.monotonic() + _POOL_WAIT_TIMEOUT
+        delay = 0.05
+        while True:
+            try:
+                conn = pool.getconn()
+                with _POOLS_LOCK:
+                    _POOLS_IN_USE[key] = _POOLS_IN_USE.get(key, 0) + 1
+                break
+            except PoolError:
+                if pool.closed or time.monotonic() >= deadline:
+                    raise PoolError(
+                        f"Không lấy được kết nối: pool đã dùng hết {self.pool_max} kết nối "
+                        f"sau {_POOL_WAIT_TIMEOUT:.0f} giây chờ"
+                    )
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        
+        self._pool = pool
+        self._pool_key = key
+        self.conn = conn
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        self.cursor = self.conn.cursor()
+        
+        logger.info(f"Đã kết nối đến database: {self.database}")
+    
     def connect_to_database(self) -> bool:
         """
         Kết nối đến database cụ thể
         
+        Nếu kết nối hiện tại đã trỏ tới đúng database thì dùng lại, không kết nối lại.
+        
         Returns:
             bool: True nếu kết nối thành công, False nếu thất bại
         """
         try:
-            # Đóng kết nối hiện tại
-            self.close()
-            
-            # Kết nối đến database cụ thể
-            self.conn = psycopg2.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-            self.cursor = self.conn.cursor()
+            if self.conn is not None and not self.conn.closed and self.conn.info.dbname == self.database:
+                return True
             
-            logger.info(f"Đã kết nối đến database: {self.database}")
+            self._acquire_connection()
             return True
         except Exception as e:
             logger.error(f"Lỗi khi kết nối đến database: {e}")
             return False
     
+    def ensure_database(self) -> bool:
+        """
+        Kết nối đến database cụ thể, chỉ tạo database khi chưa tồn tại
+        
+        Thử lấy kết nối trực tiếp tới database trước; chỉ khi thất bại mới kết nối
+        tới maintenance database để tạo database rồi kết nối lại.
+        
+        Returns:
+            bool: True nếu kết nối thành công, False nếu thất bại
+        """
+        if self.conn is not None and not self.conn.closed and self.conn.info.dbname == self.database:
+            return True
+        
+        try:
+            self._acquire_connection()
+            return True
+        except psycopg2.OperationalError as e:
+            # Database có thể chưa tồn tại
+            logger.info(f"Chưa thể kết nối trực tiếp đến database {self.database}: {e}")
+            self.close()
+        
+        if not self.connect():
+            return False
+        if not self.create_database():
+            return False
+        return self.connect_to_database()
+    
+    def execute_script(self, statements: List[Union[str, tuple]]):
+        """
+        Gửi nhiều câu lệnh lên server trong một lần execute (một round trip)
+        
+        Các câu lệnh được mogrify phía client rồi nối bằng dấu ";" thành một lệnh duy nhất;
+        PostgreSQL thực thi chúng tuần tự trong cùng một transaction ngầm định. Không xóa
+        cache: nếu câu lệnh thay đổi dữ liệu hoặc schema, gọi invalidate_caches().
+        
+        Args:
+            statements (list): Danh sách câu lệnh SQL hoặc tuple (câu lệnh, tham số)
+        """
+        parts = []
+        for statement in statements:
+            if isinstance(statement, tuple):
+                query, params = statement
+            else:
+                query, params = statement, None
+            parts.append(self.cursor.mogrify(query, params))
+        self.cursor.execute(b";\n".join(parts))
+    
+    def invalidate_caches(self):
+        """
+        Xóa mọi cache trong process của database này (thống kê, schema đã kiểm tra,
+        kiểu cột cho COPY) sau khi dữ liệu hoặc schema bị thay đổi ngoài các phương thức
+        của connector (ví dụ DELETE/DROP TABLE trực tiếp)
+        """
+        key = (self.host, self.port, self.database)
+        _STATS_CACHE.pop(key, None)
+        _SCHEMA_READY.discard(key)
+        _COMMENT_COPY_TYPES.pop(key, None)
+    
+    @contextmanager
+    def transaction(self, readonly: bool = False):
+        """
+        Thực thi một khối lệnh trong một transaction duy nhất (BEGIN ... COMMIT)
+        
+        Kết nối mặc định ở chế độ autocommit; trong khối with, autocommit được tắt để
+        toàn bộ câu lệnh chỉ commit một lần, rollback nếu có lỗi rồi khôi phục lại
+        autocommit. Gọi lồng nhau sẽ dùng chung transaction bên ngoài.
+        
+        Args:
+            readonly (bool): Transaction chỉ đọc (BEGIN READ ONLY), không làm mất hiệu lực
+                cache thống kê
+        
+        Yields:
+            cursor: Cursor của kết nối hiện tại
+        """
+        if self._in_transaction:
+            yield self.cursor
+            return
+        
+        autocommit = self.conn.autocommit
+        self.conn.autocommit = False
+        if readonly:
+            self.conn.readonly = True
+        self._in_transaction = True
+        try:
+            yield self.cursor
+            self.conn.commit()
+        except BaseException:
+            # Kể cả GeneratorExit/KeyboardInterrupt: không để transaction dở dang trên kết nối
+            self.conn.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+            if readonly:
+                self.conn.readonly = None
+            self.conn.autocommit = autocommit
+        
+        if not readonly:
+            self._invalidate_stats()
+    
+    def _invalidate_stats(self):
+        """Xóa cache thống kê của database sau khi dữ liệu thay đổi"""
+        _STATS_CACHE.pop((self.host, self.port, self.database), None)
+    
+    def _prepare(self, name: str) -> bool:
+        """
+        PREPARE câu lệnh trong _PREPARED_STATEMENTS trên kết nối hiện tại nếu chưa có
+        
+        Mỗi kết nối vật lý trong pool chỉ PREPARE một lần, vào lần đầu câu lệnh được dùng
+        (không phải mỗi lần lấy kết nối), nên database chưa có bảng videos (ví dụ khi đang
+        setup_database) không bị ảnh hưởng.
+        
+        Args:
+            name (str): Tên câu lệnh
+            
+        Returns:
+            bool: True nếu có thể EXECUTE câu lệnh, False nếu kết nối không lấy từ pool
+        """
+        prepared = getattr(self.conn, 'prepared_statements', None)
+        if prepared is None:
+            return False
+        if name not in prepared:
+            self.cursor.execute(_PREPARED_STATEMENTS[name])
+            prepared.add(name)
+        return True
+    
     def create_tables(self) -> bool:
         """
         Tạo các bảng cần thiết trong database
         
+        Chỉ chạy DDL khi bảng hoặc chỉ mục còn thiếu (kiểm tra nhanh bằng to_regclass).
+        Kết quả kiểm tra được nhớ trong process nên các lần gọi sau không cần truy vấn catalog.
+        
         Returns:
             bool: True nếu tạo thành công, False nếu thất bại
         """
+        schema_key = (self.host, self.port, self.database)
+        if schema_key in _SCHEMA_READY:
+            return True
+        
         try:
-            # Tạo bảng videos để lưu thông tin video
+            # Kiểm tra nhanh trong catalog, không cần khóa như CREATE TABLE IF NOT EXISTS
+            self.cursor.execute("""
+            SELECT to_regclass('videos'), to_regclass('comments'), to_regclass('idx_comments_video_page')
+            """)
+            videos_table, comments_table, video_seek_index = self.cursor.fetchone()
+            
+            if videos_table and comments_table and video_seek_index:
+                _SCHEMA_READY.add(schema_key)
+                return True
+            
+            # Tạo bảng videos và comments trong một lần gửi
             self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS videos (
                 video_id VARCHAR(255) PRIMARY KEY,
                 video_url TEXT NOT NULL,
                 author VARCHAR(255),
                 title TEXT,
+                description TEXT,
+                views_count BIGINT,
+                likes_count BIGINT,
+                shares_count BIGINT,
+                comments_count BIGINT,
+                post_time VARCHAR(255),
+                music_name TEXT,
+                tags TEXT[],
                 crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
+            );
             
-            # Tạo bảng comments để lưu thông tin bình luận
-            self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS comments (
-                comment_id SERIAL PRIMARY KEY,
-                video_id VARCHAR(255) REFERENCES videos(video_id),
+                comment_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                video_id VARCHAR(255) REFERENCES videos(video_id) ON DELETE CASCADE,
                 username VARCHAR(255) NOT NULL,
                 comment_text TEXT,
                 likes INTEGER DEFAULT 0,
                 comment_time VARCHAR(255),
                 replies_count INTEGER DEFAULT 0,
                 is_reply BOOLEAN DEFAULT FALSE,
-                parent_comment_id INTEGER,
+                parent_comment_id BIGINT,
+                avatar_url TEXT,
+                avatar_path TEXT,
                 crawled_at TIMESTAMP
-            )
+            );
             """)
             
+            self.create_indexes()
+            
+            _SCHEMA_READY.add(schema_key)
             logger.info("Đã tạo các bảng cần thiết")
             return True
         except Exception as e:
             logger.error(f"Lỗi khi tạo bảng: {e}")
             return False
     
+    def create_indexes(self, concurrently: bool = False) -> bool:
+        """
+        Tạo các chỉ mục phục vụ query_comments
+        
+        (video_id, crawled_at DESC NULLS LAST, comment_id DESC) cho phép lọc theo video và phân
+        trang keyset theo thời gian bằng index scan; chỉ mục trigram (pg_trgm) giúp bộ lọc LIKE '%username%'
+        không phải quét toàn bảng. Nếu không có quyền tạo extension pg_trgm thì
+        bỏ qua chỉ mục trigram.
+        
+        Args:
+            concurrently (bool): Dùng CREATE INDEX CONCURRENTLY để thêm chỉ mục vào
+                database đang chạy mà không khóa ghi bảng comments
+        
+        Returns:
+            bool: True nếu tạo thành công, False nếu thất bại
+        """
+        try:
+            if concurrently:
+                return self._create_indexes_concurrently()
+            
+            self.cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);
+            CREATE INDEX IF NOT EXISTS idx_comments_username ON comments(username);
+            CREATE INDEX IF NOT EXISTS idx_comments_video_page ON comments(video_id, crawled_at DESC NULLS LAST, comment_id DESC);
+            DROP INDEX IF EXISTS idx_comments_video_time;
+            DROP INDEX IF EXISTS idx_comments_video_seek;
+            DO $$
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                CREATE INDEX IF NOT EXISTS idx_comments_username_trgm ON comments USING gin (username gin_trgm_ops);
+            EXCEPTION WHEN insufficient_privilege OR undefined_file THEN
+                RAISE NOTICE 'pg_trgm không khả dụng, bỏ qua chỉ mục trigram';
+            END
+            $$;
+            """)
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi tạo chỉ mục: {e}")
+            return False
+    
+    def _create_indexes_concurrently(self) -> bool:
+        """
+        Tạo chỉ mục bằng CREATE INDEX CONCURRENTLY (dùng khi nâng cấp database có sẵn)
+        
+        CONCURRENTLY không chạy được trong transaction hay trong chuỗi nhiều lệnh,
+        nên mỗi câu lệnh được gửi riêng ở chế độ autocommit.
+        
+        Returns:
+            bool: True nếu tạo thành công
+        """
+        if self._in_transaction:
+            raise RuntimeError("Không thể tạo chỉ mục CONCURRENTLY bên trong transaction")
+        
+        autocommit = self.conn.autocommit
+        self.conn.autocommit = True
+        try:
+            self.cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_video_id ON comments(video_id)")
+            self.cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_username ON comments(username)")
+            self.cursor.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_video_page "
+                "ON comments(video_id, crawled_at DESC NULLS LAST, comment_id DESC)"
+            )
+            # Chỉ mục cũ (video_id, crawled_at DESC) đã được idx_comments_video_page bao phủ;
+            # idx_comments_video_seek xếp NULL lên đầu, không khớp thứ tự trang của query_comments
+            self.cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_comments_video_time")
+            self.cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_comments_video_seek")
+            
+            try:
+                self.cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                self.cursor.execute(
+                    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_comments_username_trgm "
+                    "ON comments USING gin (username gin_trgm_ops)"
+                )
+            except (psycopg2.errors.InsufficientPrivilege, psycopg2.errors.UndefinedFile) as e:
+                logger.warning(f"pg_trgm không khả dụng, bỏ qua chỉ mục trigram: {e}")
+            
+            return True
+        finally:
+            self.conn.autocommit = autocommit
+    
     def insert_video(self, video_id: str, video_url: str, author: str = None, title: str = None) -> bool:
         """
         Thêm hoặc cập nhật thông tin video
@@ -173,129 +824,346 @@ class PostgresConnector:
             bool: True nếu thêm/cập nhật thành công, False nếu thất bại
         """
         try:
-            # Kiểm tra xem video đã tồn tại chưa
-            self.cursor.execute("SELECT 1 FROM videos WHERE video_id = %s", (video_id,))
-            exists = self.cursor.fetchone()
-            
-            if exists:
-                # Cập nhật thông tin video
-                self.cursor.execute("""
-                UPDATE videos SET 
-                    video_url = %s,
-                    author = %s,
-                    title = %s,
-                    crawled_at = CURRENT_TIMESTAMP
-                WHERE video_id = %s
-                """, (video_url, author, title, video_id))
-                logger.info(f"Đã cập nhật thông tin video: {video_id}")
+            # Thêm mới hoặc cập nhật trong một câu lệnh (upsert)
+            # Câu lệnh PREPARE chỉ có khi kết nối qua connect_to_database
+            if self._prepare('ups_video'):
+                self.cursor.execute("EXECUTE ups_video (%s, %s, %s, %s)", (video_id, video_url, author, title))
             else:
-                # Thêm video mới
                 self.cursor.execute("""
                 INSERT INTO videos (video_id, video_url, author, title)
                 VALUES (%s, %s, %s, %s)
+                ON CONFLICT (video_id) DO UPDATE SET
+                    video_url = EXCLUDED.video_url,
+                    author = EXCLUDED.author,
+                    title = EXCLUDED.title,
+                    crawled_at = CURRENT_TIMESTAMP
+                RETURNING (xmax = 0) AS inserted
                 """, (video_id, video_url, author, title))
-                logger.info(f"Đã thêm video mới: {video_id}")
+            inserted = self.cursor.fetchone()[0]
+            self._invalidate_stats()
+            
+            # Log theo từng video ở mức DEBUG (định dạng lười) để không tốn chi phí khi thêm hàng loạt
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Đã %s video: %s", "thêm mới" if inserted else "cập nhật", video_id)
                 
             return True
         except Exception as e:
             logger.error(f"Lỗi khi thêm/cập nhật video: {e}")
             return False
     
-    def insert_comments(self, video_id: str, comments_data: List[Dict[str, Any]]) -> bool:
+    def _multi_insert(self, table: str, columns: tuple, rows: List[tuple],
+                      page_size: int = 1000, suffix: str = "", fetch: bool = False) -> List[tuple]:
+        """
+        Thêm nhiều dòng bằng một câu lệnh INSERT ... VALUES (...), (...), ... cho mỗi trang
+        
+        Args:
+            table (str): Tên bảng đích
+            columns (tuple): Danh sách cột
+            rows (list): Danh sách các dòng (tuple) theo thứ tự cột
+            page_size (int): Số dòng trong mỗi câu lệnh
+            suffix (str): Phần bổ sung sau VALUES (ví dụ ON CONFLICT, RETURNING)
+            fetch (bool): Trả về kết quả của RETURNING
+            
+        Returns:
+            list: Các dòng trả về nếu fetch=True, ngược lại là None
+        """
+        statement = _insert_sql(table, tuple(columns)).as_string(self.conn)
+        if suffix:
+            statement += " " + suffix
+        return execute_values(self.cursor, statement, rows, page_size=page_size, fetch=fetch)
+    
+    def _batch_update(self, statement: str, rows: List[tuple], page_size: int = 500):
+        """
+        Thực thi một câu lệnh (không phải INSERT đơn giản, ví dụ UPDATE) cho nhiều dòng,
+        gộp page_size câu lệnh vào mỗi lần gửi lên server
+        
+        Args:
+            statement (str): Câu lệnh SQL với tham số %s
+            rows (list): Danh sách tham số cho từng lần thực thi
+            page_size (int): Số câu lệnh trong mỗi lần gửi
+        """
+        execute_batch(self.cursor, statement, rows, page_size=page_size)
+    
+    def _copy_rows_binary(self, table: str, rows: List[tuple], types: tuple,
+                          columns: tuple = None, chunk_size: int = 50000):
+        """
+        Đẩy các dòng vào bảng bằng COPY FROM STDIN (FORMAT BINARY), chia theo từng khối
+        
+        Giá trị được gửi ở dạng nhị phân nên không phải escape chuỗi hay chuyển số sang text.
+        
+        Args:
+            table (str): Tên bảng đích
+            rows (list): Danh sách các dòng (tuple) theo đúng thứ tự cột
+            types (tuple): Kiểu của từng cột (khóa của _BINARY_ENCODERS)
+            columns (tuple): Danh sách cột (mặc định là tất cả các cột của bảng)
+            chunk_size (int): Số dòng tối đa trong mỗi lần COPY
+        """
+        statement = _copy_sql(table, tuple(columns) if columns else None, 'binary').as_string(self.conn)
+        for start in range(0, len(rows), chunk_size):
+            buf = io.BytesIO(_pack_binary_copy(rows[start:start + chunk_size], types))
+            self.cursor.copy_expert(statement, buf)
+    
+    def insert_videos(self, videos: List[Dict[str, Any]]) -> bool:
+        """
+        Thêm hoặc cập nhật nhiều video cùng lúc
+        
+        Args:
+            videos (list): Danh sách video, mỗi video là dict với video_id, video_url, author, title
+            
+        Returns:
+            bool: True nếu thêm/cập nhật thành công, False nếu thất bại
+        """
+        try:
+            # Bỏ trùng video_id trong lô (ON CONFLICT không cho phép cập nhật một dòng hai lần)
+            rows = {
+                video.get('video_id'): (video.get('video_id'), video.get('video_url', ''), video.get('author'), video.get('title'))
+                for video in videos
+                if video.get('video_id')
+            }
+            if not rows:
+                return True
+            
+            with self.transaction():
+                self._multi_insert('videos', ('video_id', 'video_url', 'author', 'title'), list(rows.values()), suffix="""
+                ON CONFLICT (video_id) DO UPDATE SET
+                    video_url = EXCLUDED.video_url,
+                    author = EXCLUDED.author,
+                    title = EXCLUDED.title,
+                    crawled_at = CURRENT_TIMESTAMP
+                """)
+            
+            logger.info(f"Đã thêm/cập nhật {len(rows)} video")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi thêm/cập nhật danh sách video: {e}")
+            return False
+    
+    def update_video_titles(self, titles: Dict[str, str]) -> bool:
+        """
+        Cập nhật tiêu đề cho nhiều video
+        
+        Args:
+            titles (dict): Ánh xạ video_id -> tiêu đề mới
+            
+        Returns:
+            bool: True nếu cập nhật thành công, False nếu thất bại
+        """
+        try:
+            if not titles:
+                return True
+            
+            with self.transaction():
+                self._batch_update(
+                    "UPDATE videos SET title = %s WHERE video_id = %s",
+                    [(title, video_id) for video_id, title in titles.items()]
+                )
+            
+            logger.info(f"Đã cập nhật tiêu đề cho {len(titles)} video")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi cập nhật tiêu đề video: {e}")
+            return False
+    
+    def _comment_copy_types(self) -> tuple:
+        """
+        Kiểu COPY binary của các cột (comment_id, *_COMMENT_COLUMNS) theo schema thực tế
+        
+        Database tạo từ schema ban đầu dùng SERIAL/INTEGER cho comment_id và
+        parent_comment_id, schema mới dùng BIGINT; COPY binary phải gửi đúng độ rộng
+        của từng cột. Kết quả được nhớ theo database.
+        
+        Returns:
+            tuple: Kiểu của từng cột (khóa của _BINARY_ENCODERS)
+            
+        Raises:
+            ValueError: Nếu có cột thiếu hoặc kiểu không mã hóa được ở dạng binary
+        """
+        cache_key = (self.host, self.port, self.database)
+        types = _COMMENT_COPY_TYPES.get(cache_key)
+        if types is not None:
+            return types
+        
+        self.cursor.execute("""
+        SELECT attname, atttypid::regtype::text
+        FROM pg_attribute
+        WHERE attrelid = 'comments'::regclass AND attnum > 0 AND NOT attisdropped
+        """)
+        column_types = dict(self.cursor.fetchall())
+        
+        types = []
+        for column in ('comment_id',) + _COMMENT_COLUMNS:
+            type_name = _COPY_TYPE_NAMES.get(column_types.get(column))
+            if type_name is None:
+                raise ValueError(f"Không hỗ trợ COPY binary cho cột comments.{column} ({column_types.get(column)})")
+            types.append(type_name)
+        
+        types = tuple(types)
+        _COMMENT_COPY_TYPES[cache_key] = types
+        return types
+    
+    def _copy_comment_rows(self, parent_rows: List[tuple], reply_rows: List[tuple],
+                           username_to_id: Dict[str, int]):
+        """
+        Thêm bình luận bằng COPY với comment_id được dành trước từ sequence
+        
+        Args:
+            parent_rows (list): Các dòng comment gốc (theo _COMMENT_COLUMNS)
+            reply_rows (list): Các cặp (dòng reply, username của comment cha)
+            username_to_id (dict): Ánh xạ username -> comment_id, được cập nhật thêm
+        """
+        # Xác định kiểu cột trước khi dành id để không tốn giá trị sequence nếu không COPY được
+        types = self._comment_copy_types()
+        
+        # Dành trước comment_id cho toàn bộ bình luận mới trong một truy vấn, nhờ đó
+        # parent_comment_id được xác định phía client và có thể COPY thẳng vào comments
+        self.cursor.execute("""
+        SELECT nextval(pg_get_serial_sequence('comments', 'comment_id'))
+        FROM generate_series(1, %s)
+        """, (len(parent_rows) + len(reply_rows),))
+        ids = [row[0] for row in self.cursor.fetchall()]
+        
+        # Comment gốc nhận các id đầu tiên
+        rows = []
+        for comment_id, row in zip(ids, parent_rows):
+            username_to_id[row[1]] = comment_id
+            rows.append((comment_id,) + row)
+        
+        # Replies nhận các id còn lại với parent_comment_id đã được xác định
+        for comment_id, (row, parent_username) in zip(ids[len(parent_rows):], reply_rows):
+            rows.append((comment_id,) + row[:7] + (username_to_id.get(parent_username),) + row[8:])
+        
+        # COPY binary cần crawled_at ở dạng datetime: chuyển cả cột một lần
+        crawled_at = _to_timestamps(pd.Series([row[-1] for row in rows], dtype=object)).tolist()
+        rows = [row[:-1] + (ts,) for row, ts in zip(rows, crawled_at)]
+        
+        self._copy_rows_binary('comments', rows, types,
+                               columns=('comment_id',) + _COMMENT_COLUMNS)
+    
+    def _insert_comment_rows(self, parent_rows: List[tuple], reply_rows: List[tuple],
+                             username_to_id: Dict[str, int]):
+        """
+        Thêm bình luận bằng INSERT nhiều dòng (execute_values) khi không dùng được COPY
+        
+        Args:
+            parent_rows (list): Các dòng comment gốc (theo _COMMENT_COLUMNS)
+            reply_rows (list): Các cặp (dòng reply, username của comment cha)
+            username_to_id (dict): Ánh xạ username -> comment_id, được cập nhật thêm
+        """
+        # Lượt 1: thêm comment gốc, lấy lại comment_id theo username
+        if parent_rows:
+            returned = self._multi_insert('comments', _COMMENT_COLUMNS, parent_rows, page_size=500,
+                                          suffix="RETURNING username, comment_id", fetch=True)
+            username_to_id.update(returned)
+        
+        # Lượt 2: thêm replies với parent_comment_id đã được xác định
+        if reply_rows:
+            rows = [
+                row[:7] + (username_to_id.get(parent_username),) + row[8:]
+                for row, parent_username in reply_rows
+            ]
+            self._multi_insert('comments', _COMMENT_COLUMNS, rows, page_size=500)
+    
+    def insert_comments(self, video_id: str, comments_data: List[Dict[str, Any]],
+                        use_copy: bool = True) -> bool:
         """
         Thêm các bình luận vào database, bỏ qua các bình luận đã tồn tại
         
+        comment_id được dành trước từ sequence để xác định parent_comment_id phía client,
+        sau đó toàn bộ bình luận được đẩy vào bảng comments bằng COPY. Nếu COPY không
+        khả dụng thì dùng INSERT nhiều dòng theo hai lượt (comment gốc rồi replies).
+        
         Args:
             video_id (str): ID của video
             comments_data (list): Danh sách các bình luận
+            use_copy (bool): Dùng COPY (mặc định) hay INSERT nhiều dòng
             
         Returns:
             bool: True nếu thêm thành công, False nếu thất bại
         """
         try:
-            # Ánh xạ username với comment_id để theo dõi parent_comment
-            username_to_id = {}
-            inserted_count = 0
-            skipped_count = 0
-            
-            for comment in comments_data:
-                is_reply = comment.get('is_reply', False)
-                parent_comment_id = None
-                
-                # Nếu là reply, tìm parent_comment_id
-                if is_reply and 'parent_comment_username' in comment:
-                    parent_username = comment.get('parent_comment_username')
-                    if parent_username in username_to_id:
-                        parent_comment_id = username_to_id[parent_username]
-                
-                # Chuyển đổi chuỗi likes sang số nguyên
-                likes_text = comment.get('likes', '0')
-                try:
-                    # Xử lý các chuỗi như "1.2K", "4.5M"
-                    if isinstance(likes_text, str):
-                        if 'K' in likes_text:
-                            likes = int(float(likes_text.replace('K', '')) * 1000)
-                        elif 'M' in likes_text:
-                            likes = int(float(likes_text.replace('M', '')) * 1000000)
-                        else:
-                            likes = int(likes_text) if likes_text.isdigit() else 0
-                    else:
-                        likes = int(likes_text) if likes_text is not None else 0
-                except ValueError:
-                    likes = 0
+            with self.transaction():
+                # Lấy các bình luận đã tồn tại của video trong một truy vấn
+                self.cursor.execute("""
+                SELECT comment_id, username, comment_text FROM comments
+                WHERE video_id = %s
+                """, (video_id,))
+                existing = {(row[1], row[2]): row[0] for row in self.cursor.fetchall()}
                 
-                # Chuyển đổi chuỗi replies_count sang số nguyên
-                replies_count_text = comment.get('replies_count', '0')
-                if isinstance(replies_count_text, str):
-                    replies_count = int(replies_count_text) if replies_count_text.isdigit() else 0
-                else:
-                    replies_count = int(replies_count_text) if replies_count_text is not None else 0
+                # Ánh xạ username với comment_id để theo dõi parent_comment
+                username_to_id = {}
+                seen = set()
+                parent_rows = []
+                reply_rows = []
+                skipped_count = 0
                 
-                # Kiểm tra xem comment đã tồn tại chưa
-                self.cursor.execute("""
-                SELECT comment_id FROM comments 
-                WHERE video_id = %s AND username = %s AND comment_text = %s
-                """, (video_id, comment.get('username', ''), comment.get('comment_text', '')))
+                # Chuyển đổi chuỗi likes và replies_count ("1.2K", "4.5M") sang số nguyên trên toàn bộ lô
+                # (tolist() trả về int của Python để psycopg2 có thể adapt)
+                # (pandas tự suy ra kiểu số khi giá trị đã là số, khi đó không cần xử lý chuỗi)
+                # (giới hạn ở _INT4_MAX vì likes/replies_count là cột INTEGER)
+                likes_list = parse_counts(pd.Series([c.get('likes', '0') for c in comments_data])).clip(upper=_INT4_MAX).tolist()
+                replies_list = parse_counts(pd.Series([c.get('replies_count', '0') for c in comments_data])).clip(upper=_INT4_MAX).tolist()
                 
-                existing_comment = self.cursor.fetchone()
+                # Gán các phương thức vào biến cục bộ để tránh tra cứu thuộc tính trong vòng lặp
+                add_seen = seen.add
+                add_parent = parent_rows.append
+                add_reply = reply_rows.append
                 
-                if existing_comment:
-                    # Comment đã tồn tại, bỏ qua
-                    skipped_count += 1
+                for i, comment in enumerate(comments_data):
+                    get = comment.get
+                    username = get('username', '')
+                    comment_text = get('comment_text', '')
+                    is_reply = _to_bool(get('is_reply', False))
+                    key = (username, comment_text)
+                    
+                    # Kiểm tra xem comment đã tồn tại chưa (trong database hoặc trong lô hiện tại)
+                    existing_id = existing.get(key)
+                    if existing_id is not None or key in seen:
+                        # Comment đã tồn tại, bỏ qua
+                        skipped_count += 1
+                        
+                        # Nếu là comment gốc, vẫn lưu ID để theo dõi parent_comment cho replies
+                        if not is_reply and existing_id is not None:
+                            username_to_id[username] = existing_id
+                        
+                        continue
+                    add_seen(key)
                     
-                    # Nếu là comment gốc, vẫn lưu ID để theo dõi parent_comment cho replies
-                    if not is_reply:
-                        username_to_id[comment.get('username', '')] = existing_comment[0]
+                    row = (
+                        video_id,
+                        username,
+                        comment_text,
+                        likes_list[i],
+                        get('comment_time', ''),
+                        replies_list[i],
+                        is_reply,
+                        None,  # parent_comment_id, được xác định sau khi thêm comment gốc
+                        get('avatar_url', ''),  # URL avatar
+                        get('avatar_path', ''),  # Đường dẫn local avatar
+                        get('crawled_at', None)
+                    )
                     
-                    continue
+                    if is_reply:
+                        add_reply((row, get('parent_comment_username')))
+                    else:
+                        add_parent(row)
                 
-                # Thêm bình luận vào database với avatar
-                self.cursor.execute("""
-                INSERT INTO comments 
-                (video_id, username, comment_text, likes, comment_time, replies_count, is_reply, parent_comment_id, avatar_url, avatar_path, crawled_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING comment_id
-                """, (
-                    video_id,
-                    comment.get('username', ''),
-                    comment.get('comment_text', ''),
-                    likes,
-                    comment.get('comment_time', ''),
-                    replies_count,
-                    is_reply,
-                    parent_comment_id,
-                    comment.get('avatar_url', ''),  # URL avatar
-                    comment.get('avatar_path', ''),  # Đường dẫn local avatar
-                    comment.get('crawled_at', None)
-                ))
+                if parent_rows or reply_rows:
+                    copied = False
+                    if use_copy:
+                        # Savepoint để có thể quay lại đường execute_values nếu COPY thất bại
+                        self.cursor.execute("SAVEPOINT copy_comments")
+                        try:
+                            self._copy_comment_rows(parent_rows, reply_rows, username_to_id)
+                            self.cursor.execute("RELEASE SAVEPOINT copy_comments")
+                            copied = True
+                        except (psycopg2.Error, struct.error, ValueError) as e:
+                            logger.warning(f"Không thể COPY bình luận, chuyển sang INSERT nhiều dòng: {e}")
+                            self.cursor.execute("ROLLBACK TO SAVEPOINT copy_comments")
+                    
+                    if not copied:
+                        self._insert_comment_rows(parent_rows, reply_rows, username_to_id)
                 
-                # Lưu comment_id với username để theo dõi parent_comment
-                comment_id = self.cursor.fetchone()[0]
-                username_to_id[comment.get('username', '')] = comment_id
-                inserted_count += 1
-            
-            # Commit changes
-            self.conn.commit()
+            inserted_count = len(parent_rows) + len(reply_rows)
             
             logger.info(f"Đã thêm {inserted_count} bình luận mới, bỏ qua {skipped_count} bình luận trùng lặp cho video: {video_id}")
             return True
@@ -315,37 +1183,46 @@ class PostgresConnector:
             bool: True nếu lưu thành công, False nếu thất bại
         """
         try:
-            # Thêm query vào bảng search_queries
-            self.cursor.execute("""
-            INSERT INTO search_queries (keyword, results_count, created_at)
-            VALUES (%s, %s, CURRENT_TIMESTAMP)
-            RETURNING query_id
-            """, (keyword, len(videos)))
-            
-            query_id = self.cursor.fetchone()[0]
-            
-            # Thêm từng kết quả vào bảng search_results
-            for i, video in enumerate(videos):
-                video_id = video.get('video_id')
-                
-                # Kiểm tra xem video đã tồn tại trong database chưa
-                self.cursor.execute("SELECT 1 FROM videos WHERE video_id = %s", (video_id,))
-                exists = self.cursor.fetchone()
-                
-                # Nếu chưa tồn tại, thêm mới với thông tin cơ bản
-                if not exists:
-                    self.insert_video_with_details(
-                        video_id=video_id,
-                        video_url=video.get('video_url', ''),
-                        author=video.get('author', None),
-                        description=video.get('description', None)
-                    )
-                
-                # Thêm kết quả tìm kiếm vào bảng search_results
+            if videos:
+                # Thêm các video chưa có, query vào search_queries và toàn bộ kết quả vào
+                # search_results trong cùng một câu lệnh (một round trip). Dữ liệu được gửi
+                # dưới dạng các mảng song song rồi unnest phía server, nên câu lệnh có dạng
+                # cố định với mọi số lượng kết quả. Khóa ngoại của search_results được kiểm
+                # tra cuối câu lệnh nên thấy các video vừa thêm.
                 self.cursor.execute("""
+                WITH r AS (
+                    SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[])
+                        WITH ORDINALITY AS r(video_id, video_url, author, description, rank)
+                ),
+                v AS (
+                    INSERT INTO videos (video_id, video_url, author, description)
+                    SELECT video_id, video_url, author, description FROM r
+                    WHERE video_id IS NOT NULL
+                    ON CONFLICT (video_id) DO NOTHING
+                ),
+                q AS (
+                    INSERT INTO search_queries (keyword, results_count, created_at)
+                    VALUES (%s, %s, CURRENT_TIMESTAMP)
+                    RETURNING query_id
+                )
                 INSERT INTO search_results (query_id, video_id, rank, created_at)
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-                """, (query_id, video_id, i+1))
+                SELECT q.query_id, r.video_id, r.rank, CURRENT_TIMESTAMP
+                FROM q, r
+                """, (
+                    [video.get('video_id') for video in videos],
+                    [video.get('video_url', '') for video in videos],
+                    [video.get('author', None) for video in videos],
+                    [video.get('description', None) for video in videos],
+                    keyword, len(videos)
+                ))
+            else:
+                # Thêm query vào bảng search_queries
+                self.cursor.execute("""
+                INSERT INTO search_queries (keyword, results_count, created_at)
+                VALUES (%s, %s, CURRENT_TIMESTAMP)
+                """, (keyword, 0))
+            
+            self._invalidate_stats()
             
             logger.info(f"Đã lưu kết quả tìm kiếm cho từ khóa '{keyword}' với {len(videos)} kết quả")
             return True
@@ -379,55 +1256,33 @@ class PostgresConnector:
         Returns:
             bool: True nếu thêm/cập nhật thành công, False nếu thất bại
         """
+        # Khi được gọi bên trong transaction (export_dataframe_fast), lỗi của câu lệnh chỉ
+        # được hủy tới savepoint để transaction bên ngoài không rơi vào trạng thái aborted
+        savepoint = self._in_transaction
         try:
-            # Kiểm tra xem bảng videos có tồn tại không
-            self.cursor.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'videos'
-            )
-            """)
-            table_exists = self.cursor.fetchone()[0]
-            
-            if not table_exists:
-                logger.error("Bảng videos không tồn tại. Hãy thiết lập database trước.")
-                return False
-            
-            # Kiểm tra xem video đã tồn tại chưa
-            self.cursor.execute("SELECT 1 FROM videos WHERE video_id = %s", (video_id,))
-            exists = self.cursor.fetchone()
+            if savepoint:
+                self.cursor.execute("SAVEPOINT video_details")
             
             # Chuyển đổi tags thành array PostgreSQL
             tags_array = None
             if tags:
                 tags_array = tags
             
-            if exists:
-                # Cập nhật thông tin video
-                self.cursor.execute("""
-                UPDATE videos SET 
-                    video_url = %s,
-                    author = COALESCE(%s, author),
-                    title = COALESCE(%s, title),
-                    description = COALESCE(%s, description),
-                    views_count = COALESCE(%s, views_count),
-                    likes_count = COALESCE(%s, likes_count),
-                    shares_count = COALESCE(%s, shares_count),
-                    comments_count = COALESCE(%s, comments_count),
-                    post_time = COALESCE(%s, post_time),
-                    music_name = COALESCE(%s, music_name),
-                    tags = COALESCE(%s, tags),
-                    crawled_at = CURRENT_TIMESTAMP
-                WHERE video_id = %s
-                """, (
-                    video_url, author, title, description, 
-                    views_count, likes_count, shares_count, comments_count,
-                    post_time, music_name, tags_array, video_id
-                ))
-                logger.info(f"Đã cập nhật thông tin chi tiết video: {video_id}")
+            params = (
+                video_id, video_url, author, title, description,
+                views_count, likes_count, shares_count, comments_count,
+                post_time, music_name, tags_array
+            )
+            
+            # Thêm mới hoặc cập nhật trong một câu lệnh (upsert, ngoài transaction thì tự commit
+            # nên không cần BEGIN/COMMIT riêng); khi cập nhật, giá trị None không ghi đè dữ liệu đã có.
+            # Danh sách cột cố định (COALESCE thay vì SET động theo giá trị khác None) để
+            # luôn dùng được câu lệnh đã PREPARE
+            if self._prepare('ups_video_details'):
+                self.cursor.execute(
+                    "EXECUTE ups_video_details (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", params
+                )
             else:
-                # Thêm video mới
                 self.cursor.execute("""
                 INSERT INTO videos (
                     video_id, video_url, author, title, description,
@@ -435,26 +1290,56 @@ class PostgresConnector:
                     post_time, music_name, tags
                 )
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    video_id, video_url, author, title, description,
-                    views_count, likes_count, shares_count, comments_count,
-                    post_time, music_name, tags_array
-                ))
-                logger.info(f"Đã thêm video mới với thông tin chi tiết: {video_id}")
+                ON CONFLICT (video_id) DO UPDATE SET
+                    video_url = EXCLUDED.video_url,
+                    author = COALESCE(EXCLUDED.author, videos.author),
+                    title = COALESCE(EXCLUDED.title, videos.title),
+                    description = COALESCE(EXCLUDED.description, videos.description),
+                    views_count = COALESCE(EXCLUDED.views_count, videos.views_count),
+                    likes_count = COALESCE(EXCLUDED.likes_count, videos.likes_count),
+                    shares_count = COALESCE(EXCLUDED.shares_count, videos.shares_count),
+                    comments_count = COALESCE(EXCLUDED.comments_count, videos.comments_count),
+                    post_time = COALESCE(EXCLUDED.post_time, videos.post_time),
+                    music_name = COALESCE(EXCLUDED.music_name, videos.music_name),
+                    tags = COALESCE(EXCLUDED.tags, videos.tags),
+                    crawled_at = CURRENT_TIMESTAMP
+                RETURNING (xmax = 0) AS inserted
+                """, params)
+            inserted = self.cursor.fetchone()[0]
+            
+            if savepoint:
+                self.cursor.execute("RELEASE SAVEPOINT video_details")
+            
+            self._invalidate_stats()
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Đã %s thông tin chi tiết video: %s",
+                             "thêm mới" if inserted else "cập nhật", video_id)
             
-            # Commit thay đổi
-            self.conn.commit()
-                
             return True
         except Exception as e:
-            logger.error(f"Lỗi khi thêm/cập nhật thông tin chi tiết video: {e}")
-            self.conn.rollback()  # Rollback nếu có lỗi
+            # Rollback nếu có lỗi (tới savepoint khi đang trong transaction)
+            try:
+                if savepoint:
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT video_details")
+                elif not self.conn.autocommit:
+                    self.conn.rollback()
+            except Exception as rollback_error:
+                logger.error(f"Lỗi khi rollback thông tin chi tiết video: {rollback_error}")
+            
+            if isinstance(e, psycopg2.errors.UndefinedTable):
+                logger.error("Bảng videos không tồn tại. Hãy thiết lập database trước.")
+            else:
+                logger.error(f"Lỗi khi thêm/cập nhật thông tin chi tiết video: {e}")
             return False
         
     def export_dataframe_to_postgres(self, df: pd.DataFrame, video_id: str, video_url: str, video_info: Dict[str, Any] = None) -> bool:
         """
         Xuất DataFrame vào PostgreSQL
         
+        DataFrame được ghi thẳng theo cột sang CSV rồi COPY vào database
+        (xem export_dataframe_fast), không chuyển thành list các dict.
+        
         Args:
             df (DataFrame): DataFrame chứa dữ liệu bình luận
             video_id (str): ID của video
@@ -464,114 +1349,348 @@ class PostgresConnector:
         Returns:
             bool: True nếu xuất thành công, False nếu thất bại
         """
+        if len(df) > _BULK_LOAD_THRESHOLD:
+            return self.bulk_load_comments(df, video_id, video_url, video_info)
+        return self.export_dataframe_fast(df, video_id, video_url, video_info)
+    
+    def bulk_load_comments(self, df: pd.DataFrame, video_id: str, video_url: str,
+                           video_info: Dict[str, Any] = None) -> bool:
+        """
+        Nạp một lượng lớn bình luận trong một transaction
+        
+        Nếu người dùng là superuser thì tắt kiểm tra khóa ngoại và trigger
+        (session_replication_role = replica) trong transaction để COPY không phải tra
+        bảng videos cho từng dòng; video đã được upsert trước trong cùng transaction.
+        Các chỉ mục được giữ nguyên (bỏ rồi dựng lại trong transaction sẽ khóa
+        ACCESS EXCLUSIVE bảng comments và chặn mọi truy vấn đọc trong suốt quá trình nạp).
+        
+        Args:
+            df (DataFrame): DataFrame chứa dữ liệu bình luận
+            video_id (str): ID của video
+            video_url (str): URL của video
+            video_info (dict): Thông tin bổ sung về video
+            
+        Returns:
+            bool: True nếu nạp thành công, False nếu thất bại
+        """
         try:
-            # Đảm bảo đã kết nối đến database
-            if not self.conn or not self.cursor:
-                logger.error("Chưa kết nối đến database")
-                return False
+            with self.transaction():
+                # session_replication_role chỉ superuser mới đặt được; is_superuser được server
+                # báo khi kết nối nên kiểm tra không tốn round trip
+                if self.conn.get_parameter_status('is_superuser') == 'on':
+                    self.cursor.execute("SET LOCAL session_replication_role = replica")
+                
+                if not self.export_dataframe_fast(df, video_id, video_url, video_info):
+                    raise RuntimeError("COPY bình luận thất bại")
             
-            # Chuẩn bị thông tin video để thêm vào database
-            video_data = {
-                "video_id": video_id,
-                "video_url": video_url,
-                "author": video_info.get("author") if video_info else None,
-                "title": video_info.get("title") if video_info else None,
-                "description": video_info.get("description") if video_info else None,
-                "views_count": video_info.get("views_count") if video_info else None,
-                "likes_count": video_info.get("likes_count") if video_info else None,
-                "shares_count": video_info.get("shares_count") if video_info else None,
-                "comments_count": video_info.get("comments_count") if video_info else None,
-                "post_time": video_info.get("post_time") if video_info else None,
-                "music_name": video_info.get("music") if video_info else None,
-                "tags": video_info.get("tags") if video_info else None
-            }
+            logger.info(f"Đã nạp hàng loạt {len(df)} dòng bình luận cho video: {video_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi nạp hàng loạt bình luận: {e}")
+            return False
+    
+    def _save_video_info(self, video_id: str, video_url: str, video_info: Dict[str, Any] = None) -> bool:
+        """
+        Thêm hoặc cập nhật thông tin video từ dict thông tin bổ sung
+        
+        Args:
+            video_id (str): ID của video
+            video_url (str): URL của video
+            video_info (dict): Thông tin bổ sung về video
             
-            # Thêm thông tin video
-            result = self.insert_video_with_details(
-                video_id=video_data["video_id"],
-                video_url=video_data["video_url"],
-                author=video_data["author"],
-                title=video_data["title"],
-                description=video_data["description"],
-                views_count=video_data["views_count"],
-                likes_count=video_data["likes_count"],
-                shares_count=video_data["shares_count"],
-                comments_count=video_data["comments_count"],
-                post_time=video_data["post_time"],
-                music_name=video_data["music_name"],
-                tags=video_data["tags"]
-            )
+        Returns:
+            bool: True nếu thêm/cập nhật thành công, False nếu thất bại
+        """
+        video_info = video_info or {}
+        return self.insert_video_with_details(
+            video_id=video_id,
+            video_url=video_url,
+            author=video_info.get("author"),
+            title=video_info.get("title"),
+            description=video_info.get("description"),
+            views_count=video_info.get("views_count"),
+            likes_count=video_info.get("likes_count"),
+            shares_count=video_info.get("shares_count"),
+            comments_count=video_info.get("comments_count"),
+            post_time=video_info.get("post_time"),
+            music_name=video_info.get("music"),
+            tags=video_info.get("tags")
+        )
+    
+    def export_dataframe_fast(self, df: pd.DataFrame, video_id: str, video_url: str, video_info: Dict[str, Any] = None) -> bool:
+        """
+        Xuất DataFrame vào PostgreSQL bằng COPY FROM STDIN
+        
+        Dữ liệu được COPY vào bảng tạm comments_staging, sau đó một câu lệnh
+        INSERT ... SELECT duy nhất bỏ qua bình luận trùng lặp, thêm comment gốc
+        và gán parent_comment_id cho các replies ngay trên server.
+        
+        Args:
+            df (DataFrame): DataFrame chứa dữ liệu bình luận
+            video_id (str): ID của video
+            video_url (str): URL của video
+            video_info (dict): Thông tin bổ sung về video
             
-            if not result:
-                logger.error("Lỗi khi thêm thông tin video vào database")
+        Returns:
+            bool: True nếu xuất thành công, False nếu thất bại
+        """
+        try:
+            # Đảm bảo đã kết nối đến database
+            if not self.conn or not self.cursor:
+                logger.error("Chưa kết nối đến database")
                 return False
             
-            # Chuyển đổi DataFrame thành list của dict
-            comments_data = df.to_dict('records')
+            with self.transaction():
+                if not self._save_video_info(video_id, video_url, video_info):
+                    logger.error("Lỗi khi thêm thông tin video vào database")
+                    return False
+                
+                def column(name):
+                    if name in df.columns:
+                        return df[name]
+                    return pd.Series([None] * len(df), index=df.index, dtype=object)
+                
+                # Chuẩn hóa dữ liệu theo cột trước khi COPY
+                stage = pd.DataFrame({
+                    'row_no': np.arange(len(df)),
+                    'username': column('username').fillna(''),
+                    'comment_text': column('comment_text'),
+                    'likes': parse_counts(column('likes')).clip(upper=_INT4_MAX),
+                    'comment_time': column('comment_time'),
+                    'replies_count': parse_counts(column('replies_count')).clip(upper=_INT4_MAX),
+                    'is_reply': column('is_reply').map(_to_bool),
+                    'parent_username': column('parent_comment_username'),
+                    'avatar_url': column('avatar_url'),
+                    'avatar_path': column('avatar_path'),
+                    'crawled_at': _to_timestamps(column('crawled_at')),
+                })
+                
+                # COPY binary không có chuỗi đại diện NULL, nên bình luận có nội dung đúng
+                # bằng "\N" vẫn là text; pd.NA của cột chuỗi Arrow được đổi sang None
+                stage = stage.astype(object).where(stage.notna(), None)
+                
+                # Bảng tạm chỉ tồn tại trong phiên kết nối hiện tại; tạo và làm rỗng trong một lần gửi
+                self.cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS comments_staging (
+                    row_no INTEGER,
+                    username VARCHAR(255),
+                    comment_text TEXT,
+                    likes INTEGER,
+                    comment_time VARCHAR(255),
+                    replies_count INTEGER,
+                    is_reply BOOLEAN,
+                    parent_username VARCHAR(255),
+                    avatar_url TEXT,
+                    avatar_path TEXT,
+                    crawled_at TIMESTAMP
+                );
+                TRUNCATE comments_staging;
+                """)
+                
+                # Đóng gói theo từng khối dòng để bộ nhớ đỉnh không tăng theo kích thước dữ liệu
+                for start in range(0, len(stage), _STAGING_CHUNK_SIZE):
+                    rows = list(stage.iloc[start:start + _STAGING_CHUNK_SIZE].itertuples(index=False, name=None))
+                    self._copy_rows_binary('comments_staging', rows, _STAGING_COPY_TYPES)
+                
+                # Thêm comment gốc, xác định parent_comment_id và thêm replies trong một truy vấn
+                self.cursor.execute("""
+                WITH existing AS (
+                    SELECT comment_id, username, comment_text, is_reply
+                    FROM comments
+                    WHERE video_id = %(video_id)s
+                ),
+                new_roots AS (
+                    INSERT INTO comments 
+                    (video_id, username, comment_text, likes, comment_time, replies_count, is_reply, parent_comment_id, avatar_url, avatar_path, crawled_at)
+                    SELECT DISTINCT ON (s.username, s.comment_text)
+                        %(video_id)s, s.username, s.comment_text, s.likes, s.comment_time,
+                        s.replies_count, FALSE, NULL, s.avatar_url, s.avatar_path, s.crawled_at
+                    FROM comments_staging s
+                    WHERE NOT s.is_reply
+                      AND NOT EXISTS (
+                          SELECT 1 FROM existing e
+                          WHERE e.username = s.username
+                            AND e.comment_text IS NOT DISTINCT FROM s.comment_text
+                      )
+                    ORDER BY s.username, s.comment_text, s.row_no
+                    RETURNING comment_id, username
+                ),
+                parents AS (
+                    SELECT DISTINCT ON (username) username, comment_id
+                    FROM (
+                        SELECT comment_id, username FROM new_roots
+                        UNION ALL
+                        SELECT e.comment_id, e.username
+                        FROM existing e
+                        JOIN comments_staging s
+                          ON s.username = e.username
+                         AND s.comment_text IS NOT DISTINCT FROM e.comment_text
+                         AND NOT s.is_reply
+                        WHERE NOT e.is_reply
+                    ) p
+                    ORDER BY username, comment_id DESC
+                ),
+                new_replies AS (
+                    INSERT INTO comments 
+                    (video_id, username, comment_text, likes, comment_time, replies_count, is_reply, parent_comment_id, avatar_url, avatar_path, crawled_at)
+                    SELECT DISTINCT ON (s.username, s.comment_text)
+                        %(video_id)s, s.username, s.comment_text, s.likes, s.comment_time,
+                        s.replies_count, TRUE, p.comment_id, s.avatar_url, s.avatar_path, s.crawled_at
+                    FROM comments_staging s
+                    LEFT JOIN parents p ON p.username = s.parent_username
+                    WHERE s.is_reply
+                      AND NOT EXISTS (
+                          SELECT 1 FROM existing e
+                          WHERE e.username = s.username
+                            AND e.comment_text IS NOT DISTINCT FROM s.comment_text
+                      )
+                      AND NOT EXISTS (
+                          SELECT 1 FROM comments_staging r
+                          WHERE NOT r.is_reply
+                            AND r.username = s.username
+                            AND r.comment_text IS NOT DISTINCT FROM s.comment_text
+                      )
+                    ORDER BY s.username, s.comment_text, s.row_no
+                    RETURNING 1
+                )
+                SELECT (SELECT COUNT(*) FROM new_roots), (SELECT COUNT(*) FROM new_replies)
+                """, {'video_id': video_id})
+                roots_count, replies_count = self.cursor.fetchone()
             
-            # Thêm bình luận vào database
-            success = self.insert_comments(video_id, comments_data)
+            inserted_count = roots_count + replies_count
+            logger.info(f"Đã COPY {inserted_count} bình luận mới, bỏ qua {len(df) - inserted_count} bình luận trùng lặp cho video: {video_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi khi xuất DataFrame vào PostgreSQL bằng COPY: {e}")
+            return False
+    
+    def bulk_export_dataframes(self, items: List[Tuple[pd.DataFrame, str, str, Optional[Dict[str, Any]]]],
+                               workers: int = 4) -> int:
+        """
+        Xuất bình luận của nhiều video song song, mỗi video trên một kết nối riêng từ pool
+        
+        Mỗi tác vụ lấy một kết nối khác từ pool dùng chung và chạy export_dataframe_fast
+        (upsert video + COPY bình luận) trong transaction riêng. comment_id lấy từ sequence
+        nên các lượt COPY song song vào bảng comments không xung đột với nhau.
+        
+        Args:
+            items (list): Các bộ (DataFrame, video_id, video_url, video_info)
+            workers (int): Số luồng tối đa, bị giới hạn bởi số CPU, số kết nối còn rảnh
+                trong pool và 8
             
-            # Explicitly commit changes
-            if success:
-                self.conn.commit()
+        Returns:
+            int: Số video được xuất thành công
+        """
+        if not items:
+            return 0
+        
+        # Chỉ dùng số kết nối còn rảnh trong pool: kết nối của connector này và của các
+        # phiên khác đang chiếm chỗ. Worker nào vẫn không lấy được kết nối sẽ chờ trong
+        # _acquire_connection thay vì thất bại ngay
+        workers = max(1, min(workers, os.cpu_count() or 1, self._free_pool_slots(), 8, len(items)))
+        
+        def export(item):
+            df, video_id, video_url, video_info = item
+            worker = PostgresConnector(self.host, self.port, self.user, self.password,
+                                       self.database, self.pool_max)
+            try:
+                if not worker.connect_to_database():
+                    return False
+                return worker.export_dataframe_fast(df, video_id, video_url, video_info)
+            finally:
+                worker.close()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                success_count = sum(executor.map(export, items))
             
-            return success
+            logger.info(f"Đã xuất song song {success_count}/{len(items)} video với {workers} luồng")
+            return success_count
         except Exception as e:
-            logger.error(f"Lỗi khi xuất DataFrame vào PostgreSQL: {e}")
-            # Rollback in case of error
-            if self.conn:
-                self.conn.rollback()
-            return False
+            logger.error(f"Lỗi khi xuất song song nhiều video: {e}")
+            return 0
     
-    def get_database_stats(self) -> Dict[str, Any]:
+    def _free_pool_slots(self) -> int:
+        """
+        Số kết nối còn có thể lấy từ pool dùng chung mà không phải chờ
+        
+        Returns:
+            int: Số chỗ còn rảnh (pool_max - 1 nếu pool chưa được tạo)
+        """
+        key = _pool_key(self.host, self.port, self.user, self.password, self.database)
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None or pool.closed:
+                return self.pool_max - 1
+            return pool.maxconn - _POOLS_IN_USE.get(key, 0)
+    
+    def get_database_stats(self, refresh: bool = False) -> Dict[str, Any]:
         """
         Lấy thống kê từ database
         
+        Kết quả được cache trong process khoảng _STATS_TTL giây (và bị xóa khi dữ liệu
+        được ghi qua connector) vì truy vấn phải quét toàn bộ bảng comments.
+        
+        Args:
+            refresh (bool): Bỏ qua cache và truy vấn lại
+        
         Returns:
             dict: Thông tin thống kê
         """
+        cache_key = (self.host, self.port, self.database)
+        cached = _STATS_CACHE.get(cache_key)
+        if not refresh and cached and time.monotonic() - cached[0] < _STATS_TTL:
+            return dict(cached[1])
+        
         stats = {}
         
         try:
-            # Số lượng video
-            self.cursor.execute("SELECT COUNT(*) FROM videos")
-            stats['videos_count'] = self.cursor.fetchone()[0]
-            
-            # Số lượng bình luận
-            self.cursor.execute("SELECT COUNT(*) FROM comments")
-            stats['comments_count'] = self.cursor.fetchone()[0]
+            # Lấy tất cả thống kê trong một truy vấn (một round trip)
+            # psycopg2 tự chuyển các cột json thành dict/list
+            self.cursor.execute("""
+            WITH v AS (
+                SELECT COUNT(*) AS videos_count FROM videos
+            ),
+            c AS (
+                SELECT COUNT(*) AS comments_count, COUNT(DISTINCT username) AS unique_users
+                FROM comments
+            ),
+            top_video AS (
+                SELECT v.video_id, v.video_url, COUNT(c.comment_id) AS comment_count
+                FROM videos v
+                JOIN comments c ON v.video_id = c.video_id
+                GROUP BY v.video_id, v.video_url
+                ORDER BY comment_count DESC
+                LIMIT 1
+            ),
+            top_users AS (
+                SELECT username, COUNT(*) AS comment_count
+                FROM comments
+                GROUP BY username
+                ORDER BY comment_count DESC
+                LIMIT 10
+            )
+            SELECT
+                (SELECT videos_count FROM v),
+                (SELECT comments_count FROM c),
+                (SELECT unique_users FROM c),
+                (SELECT row_to_json(top_video) FROM top_video),
+                (SELECT COALESCE(json_agg(top_users ORDER BY comment_count DESC), '[]'::json) FROM top_users)
+            """)
+            videos_count, comments_count, unique_users, most_commented, top_users = self.cursor.fetchone()
             
-            # Số lượng người dùng duy nhất
-            self.cursor.execute("SELECT COUNT(DISTINCT username) FROM comments")
-            stats['unique_users'] = self.cursor.fetchone()[0]
+            stats['videos_count'] = videos_count
+            stats['comments_count'] = comments_count
+            stats['unique_users'] = unique_users
             
             # Video có nhiều bình luận nhất
-            self.cursor.execute("""
-            SELECT v.video_id, v.video_url, COUNT(c.comment_id) as comment_count
-            FROM videos v
-            JOIN comments c ON v.video_id = c.video_id
-            GROUP BY v.video_id, v.video_url
-            ORDER BY comment_count DESC
-            LIMIT 1
-            """)
-            result = self.cursor.fetchone()
-            if result:
-                stats['most_commented_video'] = {
-                    'video_id': result[0],
-                    'video_url': result[1],
-                    'comment_count': result[2]
-                }
+            if most_commented:
+                stats['most_commented_video'] = most_commented
             
             # Người dùng tích cực nhất
-            self.cursor.execute("""
-            SELECT username, COUNT(*) as comment_count
-            FROM comments
-            GROUP BY username
-            ORDER BY comment_count DESC
-            LIMIT 10
-            """)
-            stats['top_users'] = [{'username': row[0], 'comment_count': row[1]} for row in self.cursor.fetchall()]
+            stats['top_users'] = top_users
+            
+            _STATS_CACHE[cache_key] = (time.monotonic(), dict(stats))
             
             return stats
         except Exception as e:
@@ -579,60 +1698,100 @@ class PostgresConnector:
             return stats
     
     def query_comments(self, video_id: str = None, username: str = None, 
-                       limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+                       limit: int = 100, offset: int = 0,
+                       after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
         """
         Truy vấn bình luận với các bộ lọc
         
+        Kết quả sắp xếp theo (crawled_at, comment_id) giảm dần, bình luận không có crawled_at
+        nằm cuối. Để lấy trang tiếp theo, truyền after=(rows[-1]['crawled_at'],
+        rows[-1]['comment_id']) của trang trước (crawled_at có thể là None): mỗi trang là một
+        lần seek trên chỉ mục thay vì phải bỏ qua offset dòng.
+        
         Args:
             video_id (str): ID video cần lọc
             username (str): Tên người dùng cần lọc
             limit (int): Số lượng kết quả tối đa
-            offset (int): Vị trí bắt đầu
+            offset (int): Vị trí bắt đầu (bị bỏ qua khi có after)
+            after (tuple): Khóa (crawled_at, comment_id) của dòng cuối trang trước
             
         Returns:
             list: Danh sách các bình luận thỏa mãn điều kiện
         """
         try:
-            query = "SELECT * FROM comments WHERE 1=1"
-            params = []
-            
-            if video_id:
-                query += " AND video_id = %s"
-                params.append(video_id)
-            
-            if username:
-                query += " AND username LIKE %s"
-                params.append(f"%{username}%")
-            
-            query += " ORDER BY crawled_at DESC LIMIT %s OFFSET %s"
-            params.extend([limit, offset])
-            
-            self.cursor.execute(query, tuple(params))
-            columns = [desc[0] for desc in self.cursor.description]
-            results = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
-            
-            return results
+            return list(self.iter_comments(video_id, username, limit, offset, after))
         except Exception as e:
             logger.error(f"Lỗi khi truy vấn bình luận: {e}")
             return []
     
+    def iter_comments(self, video_id: str = None, username: str = None,
+                      limit: int = 100, offset: int = 0,
+                      after: Optional[Tuple[Any, int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Duyệt lần lượt các bình luận thỏa mãn bộ lọc mà không tải toàn bộ kết quả vào bộ nhớ
+        
+        Tham số giống query_comments. Cursor phía server được đóng khi duyệt hết hoặc khi
+        generator bị đóng; lỗi được ném ra cho nơi gọi xử lý.
+        
+        Yields:
+            dict: Từng bình luận
+        """
+        # Chọn câu truy vấn dựng sẵn theo các bộ lọc được dùng
+        if after is None:
+            seek = None
+        else:
+            seek = 'null' if after[0] is None else 'value'
+        query = _QUERY_COMMENTS_VARIANTS[(bool(video_id), bool(username), seek)]
+        filters = []
+        
+        if video_id:
+            filters.append(video_id)
+        
+        if username:
+            filters.append(f"%{username}%")
+        
+        if seek is None:
+            params = filters + [limit, offset]
+        elif seek == 'null':
+            params = filters + [after[1], limit]
+        else:
+            # Hai nhánh của UNION ALL đều cần tham số của bộ lọc
+            params = filters + [after[0], after[1], limit] + filters + [limit, limit]
+        
+        # Cursor phía server (named cursor) chỉ gửi về itersize dòng mỗi lần FETCH,
+        # RealDictCursor trả về mỗi dòng dưới dạng dict. WITH HOLD cho phép cursor tồn tại
+        # ngoài transaction: generator không giữ transaction (hay _in_transaction) của
+        # connector giữa các lần yield, nên dừng sớm hoặc bỏ dở generator không làm các
+        # lệnh ghi sau đó rơi vào một transaction chỉ đọc
+        cur = self.conn.cursor(name=f'q_comments_{uuid4().hex}', cursor_factory=RealDictCursor,
+                               withhold=True)
+        try:
+            cur.itersize = 2000
+            cur.execute(query, tuple(params))
+            yield from cur
+        finally:
+            if not cur.connection.closed:
+                cur.close()
+    
     def test_connection(self) -> bool:
         """
         Kiểm tra kết nối PostgreSQL
         
+        Luôn gửi SELECT 1 lên server: trạng thái phía client (conn.status) vẫn báo sẵn sàng
+        khi server đã ngắt kết nối, đúng trường hợp cần phát hiện với kết nối lấy từ pool.
+        
         Returns:
             bool: True nếu kết nối thành công, False nếu thất bại
         """
         try:
-            if not self.conn or not self.cursor:
+            if not self.conn or not self.cursor or self.conn.closed:
                 return False
-                
+            
             self.cursor.execute("SELECT 1")
             return self.cursor.fetchone()[0] == 1
         except Exception:
             return False
 
-
 def get_db_connector(config: Dict[str, Any] = None) -> PostgresConnector:
     """
     Lấy đối tượng kết nối database dựa trên cấu hình
@@ -651,13 +1810,15 @@ def get_db_connector(config: Dict[str, Any] = None) -> PostgresConnector:
     user = config.get('db_user', 'postgres')
     password = config.get('db_password', '')
     database = config.get('db_name', 'tiktok_data')
+    pool_max = config.get('db_pool_max', 16)
     
     db = PostgresConnector(
         host=host, 
         port=port, 
         user=user, 
         password=password, 
-        database=database
+        database=database,
+        pool_max=pool_max
     )
     
     return db
@@ -676,65 +1837,15 @@ def setup_database(config: Dict[str, Any] = None) -> bool:
     db = get_db_connector(config)
     
     try:
-        # Kết nối đến PostgreSQL server
-        if not db.connect():
-            logger.error("Không thể kết nối đến PostgreSQL server")
-            return False
-        
-        # Tạo database nếu chưa tồn tại
-        if not db.create_database():
-            logger.error("Không thể tạo database")
-            return False
-        
-        # Kết nối đến database cụ thể
-        if not db.connect_to_database():
+        # Kết nối đến database cụ thể (tạo database nếu chưa tồn tại)
+        if not db.ensure_database():
             logger.error("Không thể kết nối đến database cụ thể")
             return False
         
-        # Tạo các bảng cần thiết
-        db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS videos (
-            video_id VARCHAR(255) PRIMARY KEY,
-            video_url TEXT NOT NULL,
-            author VARCHAR(255),
-            title TEXT,
-            description TEXT,
-            views_count BIGINT,
-            likes_count BIGINT,
-            shares_count BIGINT,
-            comments_count BIGINT,
-            post_time VARCHAR(255),
-            music_name TEXT,
-            tags TEXT[],
-            crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS comments (
-            comment_id SERIAL PRIMARY KEY,
-            video_id VARCHAR(255) REFERENCES videos(video_id) ON DELETE CASCADE,
-            username VARCHAR(255) NOT NULL,
-            comment_text TEXT,
-            likes INTEGER DEFAULT 0,
-            comment_time VARCHAR(255),
-            replies_count INTEGER DEFAULT 0,
-            is_reply BOOLEAN DEFAULT FALSE,
-            parent_comment_id INTEGER,
-            avatar_url TEXT,
-            avatar_path TEXT,
-            crawled_at TIMESTAMP
-        )
-        """)
-        
-        # Tạo các chỉ mục
-        db.cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);
-        CREATE INDEX IF NOT EXISTS idx_comments_username ON comments(username);
-        """)
-        
-        # Commit các thay đổi
-        db.conn.commit()
+        # Tạo các bảng và chỉ mục cần thiết
+        if not db.create_tables():
+            logger.error("Không thể tạo các bảng cần thiết")
+            return False
         
         logger.info("Đã thiết lập database thành công")
         return True
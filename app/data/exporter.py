@@ -1,12 +1,47 @@
+import os
+import shutil
+import tempfile
 import pandas as pd
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Union, Optional
 
+# Kích thước bộ đệm ghi file (1 MiB)
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Số dòng tối thiểu cho mỗi phần khi xuất Parquet chia nhỏ
+_ROWS_PER_SHARD = 100000
+
+# Các thư mục đầu ra đã được tạo/kiểm tra trong process
+_ENSURED_DIRS = set()
+
+def _prepare_output(output_file: Union[str, Path]) -> Path:
+    """
+    Chuyển đường dẫn đầu ra sang Path và tạo thư mục cha nếu chưa tồn tại
+    
+    Mỗi thư mục chỉ được mkdir một lần trong process, các lần xuất sau vào cùng
+    thư mục không phải gọi lại hệ thống.
+    
+    Args:
+        output_file (str/Path): Đường dẫn file đầu ra
+        
+    Returns:
+        Path: Đường dẫn file đầu ra
+    """
+    output_path = Path(output_file)
+    parent = output_path.parent
+    if parent not in _ENSURED_DIRS:
+        parent.mkdir(parents=True, exist_ok=True)
+        _ENSURED_DIRS.add(parent)
+    return output_path
+
 def export_to_csv(df: pd.DataFrame, output_file: Union[str, Path]) -> bool:
     """
     Xuất DataFrame sang file CSV
     
+    Ghi bằng to_csv của pandas qua file có bộ đệm lớn. File có BOM UTF-8 để mở
+    đúng trong Excel.
+    
     Args:
         df (DataFrame): DataFrame cần xuất
         output_file (str/Path): Đường dẫn file đầu ra
@@ -15,25 +50,147 @@ def export_to_csv(df: pd.DataFrame, output_file: Union[str, Path]) -> bool:
         bool: True nếu xuất thành công, False nếu thất bại
     """
     try:
-        # Chuyển đổi sang Path object
-        output_path = Path(output_file)
+        # Chuyển đổi sang Path object và tạo thư mục nếu chưa tồn tại
+        output_path = _prepare_output(output_file)
+        
+        # Xuất dữ liệu (cùng định dạng với to_csv theo đường dẫn, chỉ thêm bộ đệm ghi)
+        with open(output_path, 'w', encoding='utf-8-sig', newline='',
+                  buffering=_WRITE_BUFFER_SIZE) as f:
+            df.to_csv(f, index=False)
+        
+        return True
+    except Exception as e:
+        print(f"Lỗi khi xuất CSV: {e}")
+        return False
+
+def export_to_parquet(df: pd.DataFrame, output_file: Union[str, Path],
+                      compression: str = 'zstd') -> bool:
+    """
+    Xuất DataFrame sang file Parquet (định dạng cột, nén)
+    
+    Nhỏ hơn và ghi/đọc nhanh hơn CSV/JSON vì không phải chuyển từng giá trị sang chuỗi.
+    Cần cài đặt pyarrow.
+    
+    Args:
+        df (DataFrame): DataFrame cần xuất
+        output_file (str/Path): Đường dẫn file đầu ra
+        compression (str): Thuật toán nén (zstd, snappy, gzip hoặc None)
         
-        # Tạo thư mục nếu chưa tồn tại
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+    Returns:
+        bool: True nếu xuất thành công, False nếu thất bại
+    """
+    try:
+        # Chuyển đổi sang Path object và tạo thư mục nếu chưa tồn tại
+        output_path = _prepare_output(output_file)
         
         # Xuất dữ liệu
-        df.to_csv(output_path, index=False, encoding='utf-8-sig')
+        df.to_parquet(output_path, index=False, compression=compression)
         
         return True
     except Exception as e:
-        print(f"Lỗi khi xuất CSV: {e}")
+        print(f"Lỗi khi xuất Parquet: {e}")
         return False
 
+def export_parquet_many(df: pd.DataFrame, output_dir: Union[str, Path],
+                        shards: Optional[int] = None, compression: str = 'zstd') -> bool:
+    """
+    Xuất DataFrame thành nhiều file Parquet (part-0000.parquet, ...) ghi song song
+    
+    Trình ghi Parquet của pyarrow nhả GIL nên các phần được ghi đồng thời bằng luồng.
+    pandas/pyarrow đọc cả thư mục như một dataset duy nhất (pd.read_parquet(output_dir)).
+    Các phần được ghi vào một thư mục tạm rồi mới thay cho output_dir, nên lỗi giữa chừng
+    không làm mất dữ liệu của lần xuất trước. Không ghi đè thư mục chứa file khác ngoài
+    các phần part-*.parquet. Cần cài đặt pyarrow.
+    
+    Args:
+        df (DataFrame): DataFrame cần xuất
+        output_dir (str/Path): Thư mục đầu ra
+        shards (int): Số phần (mặc định theo số CPU và kích thước dữ liệu)
+        compression (str): Thuật toán nén (zstd, snappy, gzip hoặc None)
+        
+    Returns:
+        bool: True nếu xuất thành công, False nếu thất bại
+    """
+    tmp_dir = None
+    try:
+        # Tạo thư mục cha của output_dir nếu chưa tồn tại
+        output_path = _prepare_output(output_dir)
+        
+        if output_path.exists() and any(
+            not (part.name.startswith('part-') and part.suffix == '.parquet')
+            for part in output_path.iterdir()
+        ):
+            print(f"Lỗi khi xuất Parquet: thư mục {output_path} chứa file khác, không ghi đè")
+            return False
+        
+        if shards is None:
+            shards = min(os.cpu_count() or 1, -(-len(df) // _ROWS_PER_SHARD))
+        shards = max(1, shards)
+        bounds = [len(df) * i // shards for i in range(shards + 1)]
+        
+        # Thư mục tạm nằm cạnh output_dir (cùng hệ thống file) để đổi tên được
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f".{output_path.name}.", dir=output_path.parent))
+        
+        def write_shard(i):
+            df.iloc[bounds[i]:bounds[i + 1]].to_parquet(
+                tmp_dir / f"part-{i:04d}.parquet", index=False, compression=compression
+            )
+        
+        with ThreadPoolExecutor(max_workers=shards) as executor:
+            list(executor.map(write_shard, range(shards)))
+        
+        # Thay thư mục của lần xuất trước bằng thư mục vừa ghi xong
+        if output_path.exists():
+            old_dir = tmp_dir.with_name(tmp_dir.name + '.old')
+            output_path.rename(old_dir)
+            try:
+                tmp_dir.rename(output_path)
+            except Exception:
+                old_dir.rename(output_path)
+                raise
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            tmp_dir.rename(output_path)
+        tmp_dir = None
+        
+        return True
+    except Exception as e:
+        print(f"Lỗi khi xuất Parquet: {e}")
+        return False
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _column_width(values: pd.Series) -> int:
+    """
+    Độ dài hiển thị lớn nhất của một cột, tính theo cả cột thay vì từng giá trị
+    
+    Args:
+        values (Series): Cột cần tính
+        
+    Returns:
+        int: Số ký tự của giá trị dài nhất (0 nếu cột rỗng)
+    """
+    if values.empty:
+        return 0
+    if pd.api.types.is_bool_dtype(values):
+        return 5
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return 19
+    if pd.api.types.is_integer_dtype(values):
+        # Số chữ số của giá trị tuyệt đối lớn nhất, cộng dấu "-" nếu có số âm
+        return len(str(int(values.abs().max()))) + int(values.min() < 0)
+    lengths = values.astype(str).str.len()
+    return int(lengths.max())
+
 def export_to_excel(df: pd.DataFrame, output_file: Union[str, Path], 
                    sheet_name: str = "Comments") -> bool:
     """
     Xuất DataFrame sang file Excel
     
+    Ghi thẳng từng dòng bằng xlsxwriter ở chế độ constant_memory (mỗi dòng được ghi ra
+    file ngay khi xong) thay vì đi qua df.to_excel và ExcelFormatter của pandas.
+    
     Args:
         df (DataFrame): DataFrame cần xuất
         output_file (str/Path): Đường dẫn file đầu ra
@@ -43,19 +200,34 @@ def export_to_excel(df: pd.DataFrame, output_file: Union[str, Path],
         bool: True nếu xuất thành công, False nếu thất bại
     """
     try:
-        # Chuyển đổi sang Path object
-        output_path = Path(output_file)
+        import xlsxwriter
         
-        # Tạo thư mục nếu chưa tồn tại
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Chuyển đổi sang Path object và tạo thư mục nếu chưa tồn tại
+        output_path = _prepare_output(output_file)
         
-        # Xuất dữ liệu
-        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            
-            # Tạo định dạng cho workbook
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
+        # Cột thời gian cần định dạng riêng để Excel hiển thị ngày giờ thay vì số
+        datetime_cols = [i for i, col in enumerate(df.columns)
+                         if pd.api.types.is_datetime64_any_dtype(df[col])]
+        
+        # Chuyển dữ liệu sang các cột object một lần: NaN/NaT thành None (ô trống),
+        # list/dict (ví dụ cột hashtags) thành chuỗi
+        columns = []
+        for col in df.columns:
+            values = df[col].astype(object).where(df[col].notna(), None)
+            if values.dtype == object:
+                values = values.map(lambda v: str(v) if isinstance(v, (list, tuple, dict, set)) else v)
+            columns.append(values.tolist())
+        
+        workbook = xlsxwriter.Workbook(output_path, {
+            'constant_memory': True,
+            'use_zip64': True,
+            'remove_timezone': True,
+            # Giữ nguyên chuỗi bắt đầu bằng "=" hoặc là URL (không tạo công thức/hyperlink)
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+        })
+        try:
+            worksheet = workbook.add_worksheet(sheet_name)
             
             # Định dạng tiêu đề
             header_format = workbook.add_format({
@@ -65,15 +237,22 @@ def export_to_excel(df: pd.DataFrame, output_file: Union[str, Path],
                 'bg_color': '#D7E4BC',
                 'border': 1
             })
+            datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
             
-            # Áp dụng định dạng cho tiêu đề
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                
-            # Tự động điều chỉnh độ rộng cột
+            # Tự động điều chỉnh độ rộng cột (phải đặt trước khi ghi dữ liệu ở chế độ constant_memory)
             for i, col in enumerate(df.columns):
-                column_width = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                worksheet.set_column(i, i, column_width)
+                column_width = max(_column_width(df[col]), len(str(col))) + 2
+                worksheet.set_column(i, i, min(column_width, 255))
+            
+            # Ghi tiêu đề rồi ghi lần lượt từng dòng theo thứ tự (yêu cầu của constant_memory)
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+            for r, row in enumerate(zip(*columns), start=1):
+                worksheet.write_row(r, 0, row)
+                for c in datetime_cols:
+                    if row[c] is not None:
+                        worksheet.write_datetime(r, c, row[c], datetime_format)
+        finally:
+            workbook.close()
         
         return True
     except Exception as e:
@@ -95,18 +274,13 @@ def export_to_json(df: pd.DataFrame, output_file: Union[str, Path],
         bool: True nếu xuất thành công, False nếu thất bại
     """
     try:
-        # Chuyển đổi sang Path object
-        output_path = Path(output_file)
-        
-        # Tạo thư mục nếu chưa tồn tại
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Chuyển đổi sang Path object và tạo thư mục nếu chưa tồn tại
+        output_path = _prepare_output(output_file)
         
-        # Chuyển đổi DataFrame sang dict
-        json_data = df.to_dict(orient=orient)
-        
-        # Xuất dữ liệu
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=indent)
+        # Ghi thẳng bằng bộ mã hóa JSON (viết bằng C) của pandas, không tạo list các dict
+        # trung gian; thời gian theo ISO 8601, NaN thành null
+        df.to_json(output_path, orient=orient, force_ascii=False, indent=indent,
+                   date_format='iso')
         
         return True
     except Exception as e:
@@ -114,7 +288,7 @@ def export_to_json(df: pd.DataFrame, output_file: Union[str, Path],
         return False
 
 def export_to_html(df: pd.DataFrame, output_file: Union[str, Path], 
-                  title: str = "TikTok Comments Data") -> bool:
+                  title: str = "TikTok Comments Data", chunk_size: int = 10000) -> bool:
     """
     Xuất DataFrame sang file HTML
     
@@ -122,19 +296,17 @@ def export_to_html(df: pd.DataFrame, output_file: Union[str, Path],
         df (DataFrame): DataFrame cần xuất
         output_file (str/Path): Đường dẫn file đầu ra
         title (str): Tiêu đề trang HTML
+        chunk_size (int): Số dòng được chuyển sang HTML và ghi ra file mỗi lần
         
     Returns:
         bool: True nếu xuất thành công, False nếu thất bại
     """
     try:
-        # Chuyển đổi sang Path object
-        output_path = Path(output_file)
-        
-        # Tạo thư mục nếu chưa tồn tại
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Chuyển đổi sang Path object và tạo thư mục nếu chưa tồn tại
+        output_path = _prepare_output(output_file)
         
-        # Tạo HTML
-        html_content = f"""<!DOCTYPE html>
+        # Phần đầu trang (tiêu đề, CSS, thông tin chung)
+        html_head = f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
@@ -179,14 +351,28 @@ def export_to_html(df: pd.DataFrame, output_file: Union[str, Path],
         <p>Tổng số bình luận: {len(df)}</p>
         <p>Thời gian xuất: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
     </div>
-    {df.to_html(index=False)}
-</body>
-</html>
 """
         
-        # Lưu HTML
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # Ghi bảng theo từng khối dòng qua file có buffer lớn thay vì dựng toàn bộ HTML
+        # trong bộ nhớ: khối đầu tiên ghi cả <table> và <thead>, các khối sau chỉ ghi
+        # phần nội dung <tbody>
+        with open(output_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.write(html_head)
+            
+            if df.empty:
+                f.write(df.to_html(index=False))
+            else:
+                for start in range(0, len(df), chunk_size):
+                    table = df.iloc[start:start + chunk_size].to_html(index=False)
+                    body_start = table.index('<tbody>') + len('<tbody>')
+                    body_end = table.rindex('</tbody>')
+                    f.write(table[:body_end] if start == 0 else table[body_start:body_end])
+                f.write('</tbody>\n</table>')
+            
+            f.write("""
+</body>
+</html>
+""")
         
         return True
     except Exception as e:
@@ -2,42 +2,188 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any
 import re
-from app.utils.helpers import format_number
+from collections import Counter
+from itertools import chain
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+# Hệ số tương ứng với hậu tố của số lượng ("1.2K", "4.5M", "1B")
+_COUNT_SUFFIXES = {'K': 1000, 'M': 1000000, 'B': 1000000000}
+
+# Số lượng dạng "1.2K", " 15 ", "4.5 m": phần số và hậu tố (tùy chọn)
+_COUNT_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMB]?)\s*$', re.IGNORECASE)
+
+_HASHTAG_RE = re.compile(r'#(\w+)')
+
+# Các mốc phân phối độ dài bình luận: 0, 50, ..., 500
+_COMMENT_LENGTH_BINS = np.arange(0, 501, 50, dtype=np.int32)
+_COMMENT_LENGTH_LABELS = pd.Index(
+    [f"{start}-{end}" for start, end in zip(_COMMENT_LENGTH_BINS[:-1], _COMMENT_LENGTH_BINS[1:])],
+    name='Độ dài'
+)
+
+# Cột nguồn -> cột do clean_data tính ra; dùng để nhận biết DataFrame đã được làm sạch
+_DERIVED_COLUMNS = {
+    'likes': 'likes_count',
+    'replies_count': 'replies_number',
+    'comment_text': 'comment_length',
+}
+
+# Các cột văn bản được chuyển sang chuỗi Arrow sau khi làm sạch
+_TEXT_COLUMNS = ('username', 'comment_text', 'comment_time')
+
+try:
+    import pyarrow  # noqa: F401
+    _TEXT_DTYPE = 'string[pyarrow]'
+except ImportError:
+    _TEXT_DTYPE = None
+
+# Từ điển từ khóa tích cực và tiêu cực đơn giản (có thể mở rộng), dạng chữ thường
+_POSITIVE_KEYWORDS = [
+    'hay', 'tốt', 'đẹp', 'thích', 'yêu', 'tuyệt vời', 'xuất sắc', 'tuyệt', 
+    'giỏi', 'thú vị', 'ủng hộ', 'tài năng', 'đỉnh', 'chất', 'vip', 'pro',
+    'hahaha', 'hihi', 'xinh', 'dễ thương', 'đáng yêu', 'cool', 'thích thú',
+    '❤️', '😍', '👍', '👏', '🔥', '💯', '👌', '😊'
+]
+
+_NEGATIVE_KEYWORDS = [
+    'tệ', 'kém', 'dở', 'ghét', 'chán', 'buồn', 'thất vọng', 'không thích',
+    'tào lao', 'vô duyên', 'nhảm', 'xấu', 'dở tệ', 'phí', 'dỡ', 'lừa đảo',
+    'scam', 'cùi', 'gà', 'dở hơi', 'phèn', 'cay', 'toxic',
+    '👎', '😒', '😡', '🤮', '💩', '😤', '🤬'
+]
+
+def _count_keywords(texts: pd.Series, keywords: list) -> np.ndarray:
+    """
+    Đếm số từ khóa (khác nhau) xuất hiện trong mỗi chuỗi của cột
+    
+    Args:
+        texts (Series): Cột văn bản đã chuyển sang chữ thường
+        keywords (list): Danh sách từ khóa
+        
+    Returns:
+        ndarray: Số từ khóa xuất hiện trong từng dòng, giá trị không phải chuỗi là 0
+    """
+    counts = np.zeros(len(texts), dtype=np.int64)
+    for keyword in keywords:
+        counts += texts.str.contains(keyword, regex=False, na=False).to_numpy(dtype=bool)
+    return counts
+
+def parse_counts(values: pd.Series) -> pd.Series:
+    """
+    Chuyển cột số lượng dạng chuỗi ("1.2K", "4.5M", "1B", "15") sang số nguyên trên toàn bộ cột
+    
+    Bản vector hóa của app.utils.helpers.format_number cho cả một cột.
+    
+    Args:
+        values (Series): Cột giá trị cần chuyển đổi
+        
+    Returns:
+        Series: Cột số nguyên (int64), giá trị không hợp lệ được coi là 0
+    """
+    # Cột đã là số (ví dụ DataFrame đã được chuẩn hóa): bỏ qua xử lý chuỗi
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return pd.to_numeric(values, errors='coerce').fillna(0).astype('int64')
+    
+    # Tách phần số và hậu tố bằng một lần khớp regex cho cả cột, rồi tra bảng hậu tố -> hệ số
+    parts = values.astype(str).str.extract(_COUNT_RE)
+    numbers = pd.to_numeric(parts[0], errors='coerce').fillna(0)
+    multiplier = parts[1].str.upper().map(_COUNT_SUFFIXES).fillna(1)
+    # Làm tròn thay vì cắt: 2.01 * 1e6 = 2009999.9999999998
+    return (numbers * multiplier).round().astype('int64')
+
+def to_arrow_strings(df: pd.DataFrame, columns: tuple = _TEXT_COLUMNS) -> pd.DataFrame:
+    """
+    Chuyển các cột văn bản sang kiểu chuỗi Arrow (string[pyarrow])
+    
+    Dữ liệu chuỗi nằm liền trong bộ đệm Arrow thay vì từng đối tượng Python, tốn ít bộ
+    nhớ hơn và các phép .str chạy trong Arrow. Chỉ chuyển các cột văn bản đã biết (không
+    phải mọi cột object) để không biến các cột chứa list thành chuỗi. Nếu chưa cài
+    pyarrow thì giữ nguyên DataFrame.
+    
+    Args:
+        df (DataFrame): DataFrame cần chuyển đổi (thay đổi trực tiếp)
+        columns (tuple): Tên các cột văn bản
+        
+    Returns:
+        DataFrame: DataFrame với các cột văn bản kiểu chuỗi Arrow
+    """
+    if _TEXT_DTYPE is None:
+        return df
+    
+    for column in columns:
+        if column in df.columns and df[column].dtype != _TEXT_DTYPE:
+            df[column] = df[column].astype(_TEXT_DTYPE)
+    return df
+
+def clean_data(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Làm sạch dữ liệu bình luận
     
+    Các hàm phân tích nhận ra DataFrame đã làm sạch qua các cột được tính thêm
+    (likes_count, replies_number, comment_length) nên không làm sạch lại.
+    
     Args:
         df (DataFrame): DataFrame chứa dữ liệu bình luận
+        inplace (bool): Làm sạch trực tiếp trên df thay vì tạo bản sao
         
     Returns:
         DataFrame: DataFrame đã được làm sạch
     """
-    # Tạo bản sao để tránh thay đổi dữ liệu gốc
-    df_clean = df.copy()
+    # Tính mọi cột mới từ df gốc trước, rồi gán từng cột thành một Series mới. Gán cả cột
+    # (df[col] = ...) thay cột trong bản sao chứ không ghi vào mảng dùng chung, nên bản sao
+    # nông vẫn không ảnh hưởng tới df của nơi gọi kể cả khi chưa bật Copy-on-Write
+    columns = {}
     
-    # Chuyển đổi cột likes và replies_count từ chuỗi sang số
-    if 'likes' in df_clean.columns:
-        df_clean['likes_count'] = df_clean['likes'].apply(format_number)
+    # Chuyển đổi cột likes và replies_count từ chuỗi sang số (vector hóa trên cả cột)
+    if 'likes' in df.columns:
+        columns['likes_count'] = parse_counts(df['likes'])
     
-    if 'replies_count' in df_clean.columns:
-        df_clean['replies_number'] = df_clean['replies_count'].apply(format_number)
+    if 'replies_count' in df.columns:
+        columns['replies_number'] = parse_counts(df['replies_count'])
     
     # Tính độ dài comment
-    if 'comment_text' in df_clean.columns:
-        df_clean['comment_length'] = df_clean['comment_text'].apply(lambda x: len(str(x)))
+    if 'comment_text' in df.columns:
+        texts = df['comment_text'].astype(_TEXT_DTYPE or 'string')
+        if _TEXT_DTYPE:
+            columns['comment_text'] = texts
+        # Bình luận trống/thiếu có độ dài 0; int32 là đủ cho độ dài chuỗi
+        columns['comment_length'] = texts.str.len().fillna(0).astype(np.int32)
     
     # Loại bỏ khoảng trắng thừa trong username
-    if 'username' in df_clean.columns:
-        df_clean['username'] = df_clean['username'].apply(lambda x: str(x).strip())
+    if 'username' in df.columns:
+        columns['username'] = df['username'].astype(str).str.strip()
     
     # Chuyển đổi cột thời gian
-    if 'comment_time' in df_clean.columns:
-        df_clean['comment_time'] = df_clean['comment_time'].apply(lambda x: str(x).strip())
+    if 'comment_time' in df.columns:
+        columns['comment_time'] = df['comment_time'].astype(str).str.strip()
+    
+    # Bản sao nông: không sao chép dữ liệu của các cột không thay đổi
+    df_clean = df if inplace else df.copy(deep=False)
+    for name, values in columns.items():
+        df_clean[name] = values
+    
+    # Lưu các cột văn bản dạng chuỗi Arrow cho các bước phân tích và xuất file
+    to_arrow_strings(df_clean)
     
     return df_clean
 
+def _ensure_clean(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Trả về DataFrame đã làm sạch, chỉ gọi clean_data khi df chưa được làm sạch
+    
+    Args:
+        df (DataFrame): DataFrame chứa dữ liệu bình luận
+        
+    Returns:
+        DataFrame: DataFrame đã làm sạch (bản sao nông nếu df đã sạch, để việc thêm
+            cột không ảnh hưởng tới df của nơi gọi)
+    """
+    # Kiểm tra chính các cột được tính thêm thay vì một cờ trong df.attrs: pandas sao
+    # chép attrs sang các DataFrame dẫn xuất (ví dụ khi chọn một phần các cột)
+    derived = [column for source, column in _DERIVED_COLUMNS.items() if source in df.columns]
+    if derived and all(column in df.columns for column in derived):
+        return df.copy(deep=False)
+    return clean_data(df)
+
 def basic_analysis(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Phân tích cơ bản dữ liệu bình luận
@@ -48,8 +194,8 @@ def basic_analysis(df: pd.DataFrame) -> Dict[str, Any]:
     Returns:
         dict: Kết quả phân tích
     """
-    # Làm sạch dữ liệu
-    df_clean = clean_data(df)
+    # Làm sạch dữ liệu (bỏ qua nếu df đã qua clean_data)
+    df_clean = _ensure_clean(df)
     
     # Kết quả phân tích
     results = {}
@@ -67,20 +213,13 @@ def basic_analysis(df: pd.DataFrame) -> Dict[str, Any]:
         results['avg_likes'] = 0
     
     # Phân phối độ dài bình luận
-    comment_length_bins = [0, 50, 100, 150, 200, 250, 300, 350, 400, 450, 500]
-    hist, bin_edges = np.histogram(df_clean['comment_length'], bins=comment_length_bins)
+    hist, _ = np.histogram(df_clean['comment_length'].to_numpy(), bins=_COMMENT_LENGTH_BINS)
     
-    # Tạo DataFrame cho phân phối độ dài
-    bin_labels = [f"{bin_edges[i]}-{bin_edges[i+1]}" for i in range(len(bin_edges)-1)]
-    results['comment_length_dist'] = pd.DataFrame({
-        'Độ dài': bin_labels,
-        'Số lượng': hist
-    }).set_index('Độ dài')
+    results['comment_length_dist'] = pd.DataFrame({'Số lượng': hist}, index=_COMMENT_LENGTH_LABELS)
     
     # Top người dùng tích cực nhất
-    top_users = df_clean['username'].value_counts().reset_index()
-    top_users.columns = ['Người dùng', 'Số bình luận']
-    results['top_users'] = top_users.set_index('Người dùng').head(10)
+    top_users = df_clean['username'].value_counts().head(10)
+    results['top_users'] = top_users.rename_axis('Người dùng').to_frame('Số bình luận')
     
     return results
 
@@ -94,42 +233,23 @@ def sentiment_analysis(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame: DataFrame đã thêm cột sentiment
     """
-    # Làm sạch dữ liệu
-    df_clean = clean_data(df)
-    
-    # Từ điển từ khóa tích cực và tiêu cực đơn giản (có thể mở rộng)
-    positive_keywords = [
-        'hay', 'tốt', 'đẹp', 'thích', 'yêu', 'tuyệt vời', 'xuất sắc', 'tuyệt', 
-        'giỏi', 'thú vị', 'ủng hộ', 'tài năng', 'đỉnh', 'chất', 'vip', 'pro',
-        'hahaha', 'hihi', 'xinh', 'dễ thương', 'đáng yêu', 'cool', 'thích thú',
-        '❤️', '😍', '👍', '👏', '🔥', '💯', '👌', '😊'
-    ]
-    
-    negative_keywords = [
-        'tệ', 'kém', 'dở', 'ghét', 'chán', 'buồn', 'thất vọng', 'không thích',
-        'tào lao', 'vô duyên', 'nhảm', 'xấu', 'dở tệ', 'phí', 'dỡ', 'lừa đảo',
-        'scam', 'cùi', 'gà', 'dở hơi', 'phèn', 'cay', 'toxic',
-        '👎', '😒', '😡', '🤮', '💩', '😤', '🤬'
-    ]
-    
-    # Function để xác định cảm xúc
-    def determine_sentiment(text):
-        if not isinstance(text, str):
-            return 'neutral'
-            
-        text = text.lower()
-        pos_count = sum(1 for keyword in positive_keywords if keyword.lower() in text)
-        neg_count = sum(1 for keyword in negative_keywords if keyword.lower() in text)
-        
-        if pos_count > neg_count:
-            return 'positive'
-        elif neg_count > pos_count:
-            return 'negative'
-        else:
-            return 'neutral'
+    # Làm sạch dữ liệu (bỏ qua nếu df đã qua clean_data)
+    df_clean = _ensure_clean(df)
+    
+    # Đếm số từ khóa tích cực/tiêu cực xuất hiện trong mỗi bình luận, vector hóa theo cột
+    # (mỗi từ khóa là một lượt str.contains trên cả cột thay vì vòng lặp Python cho từng dòng)
+    # Chuyển chữ thường một lần cho cả cột, giữ kiểu chuỗi Arrow để lower/contains chạy
+    # trong Arrow (giá trị thiếu không chứa từ khóa nào -> neutral)
+    texts = df_clean['comment_text'].astype(_TEXT_DTYPE or 'string').str.lower()
+    pos_count = _count_keywords(texts, _POSITIVE_KEYWORDS)
+    neg_count = _count_keywords(texts, _NEGATIVE_KEYWORDS)
     
     # Thêm cột cảm xúc
-    df_clean['sentiment'] = df_clean['comment_text'].apply(determine_sentiment)
+    df_clean['sentiment'] = np.select(
+        [pos_count > neg_count, neg_count > pos_count],
+        ['positive', 'negative'],
+        default='neutral'
+    )
     
     return df_clean
 
@@ -143,20 +263,12 @@ def extract_hashtags(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame: DataFrame đã thêm cột hashtags
     """
-    # Làm sạch dữ liệu
-    df_clean = clean_data(df)
-    
-    # Function để trích xuất hashtags
-    def extract_tags(text):
-        if not isinstance(text, str):
-            return []
-            
-        # Tìm các hashtag với regex
-        hashtags = re.findall(r'#(\w+)', text)
-        return hashtags
+    # Làm sạch dữ liệu (bỏ qua nếu df đã qua clean_data)
+    df_clean = _ensure_clean(df)
     
-    # Thêm cột hashtags
-    df_clean['hashtags'] = df_clean['comment_text'].apply(extract_tags)
+    # Thêm cột hashtags; bình luận thiếu được thay bằng chuỗi rỗng trước khi tìm để cho ra
+    # danh sách rỗng (từ pandas 3, astype(str) giữ nguyên NaN và findall trả về NaN)
+    df_clean['hashtags'] = df_clean['comment_text'].fillna('').astype(str).str.findall(_HASHTAG_RE)
     
     return df_clean
 
@@ -175,10 +287,9 @@ def get_popular_hashtags(df: pd.DataFrame, top_n: int = 10) -> pd.Series:
     if 'hashtags' not in df.columns:
         df = extract_hashtags(df)
     
-    # Làm phẳng danh sách hashtags
-    all_hashtags = [tag for tags in df['hashtags'] for tag in tags]
-    
-    # Đếm tần suất
-    hashtag_counts = pd.Series(all_hashtags).value_counts().head(top_n)
+    # Đếm tần suất trực tiếp trên các danh sách hashtags (không tạo list phẳng trung gian)
+    # và chỉ lấy top_n bằng heap thay vì sắp xếp toàn bộ
+    counter = Counter(chain.from_iterable(df['hashtags']))
+    hashtag_counts = pd.Series(dict(counter.most_common(top_n)), dtype='int64')
     
     return hashtag_counts
\ No newline at end of file
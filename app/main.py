@@ -1,8 +1,14 @@
 import streamlit as st
+import pandas as pd
 from pathlib import Path
 import sys
 import os
 
+# Copy-on-Write: bản sao nông (df.copy(deep=False), _ensure_clean) chỉ sao chép
+# dữ liệu khi thực sự bị ghi. Từ pandas 3 CoW luôn bật và tùy chọn này đã lỗi thời
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
 # Đảm bảo có thể import từ thư mục gốc
 root_path = Path(__file__).parent.parent
 if str(root_path) not in sys.path:
@@ -33,11 +39,18 @@ st.set_page_config(
 )
 
 # Custom CSS
+CSS_FILE = Path(__file__).parent / "ui" / "styles" / "custom.css"
+
+@st.cache_resource
+def _read_css(mtime_ns: int) -> str:
+    # Chỉ đọc lại file khi mtime thay đổi (sửa CSS trong lúc phát triển)
+    return CSS_FILE.read_text(encoding="utf-8")
+
 def load_css():
-    css_file = Path(__file__).parent / "ui" / "styles" / "custom.css"
-    if css_file.exists():
-        with open(css_file) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    # Thẻ <style> phải được render lại ở mỗi lần chạy lại script, nhưng nội dung file thì được cache
+    if CSS_FILE.exists():
+        css = _read_css(CSS_FILE.stat().st_mtime_ns)
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
 def main():
     # Load CSS
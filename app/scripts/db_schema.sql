@@ -21,7 +21,7 @@ CREATE TABLE IF NOT EXISTS videos (
 -- Tạo bảng comments để lưu thông tin bình luận
 -- Tạo bảng comments để lưu thông tin bình luận
 CREATE TABLE IF NOT EXISTS comments (
-    comment_id SERIAL PRIMARY KEY,
+    comment_id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     video_id VARCHAR(255) REFERENCES videos(video_id) ON DELETE CASCADE,
     username VARCHAR(255) NOT NULL,
     comment_text TEXT,
@@ -29,7 +29,7 @@ CREATE TABLE IF NOT EXISTS comments (
     comment_time VARCHAR(255),
     replies_count INTEGER DEFAULT 0,
     is_reply BOOLEAN DEFAULT FALSE,
-    parent_comment_id INTEGER,
+    parent_comment_id BIGINT,
     sentiment VARCHAR(20),
     hashtags TEXT[],
     avatar_url TEXT,         -- URL avatar gốc
@@ -58,9 +58,21 @@ CREATE TABLE IF NOT EXISTS search_results (
 CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);
 CREATE INDEX IF NOT EXISTS idx_comments_username ON comments(username);
 CREATE INDEX IF NOT EXISTS idx_comments_is_reply ON comments(is_reply);
+CREATE INDEX IF NOT EXISTS idx_comments_video_page ON comments(video_id, crawled_at DESC NULLS LAST, comment_id DESC);
+DROP INDEX IF EXISTS idx_comments_video_seek;
 CREATE INDEX IF NOT EXISTS idx_search_results_query_id ON search_results(query_id);
 CREATE INDEX IF NOT EXISTS idx_search_results_video_id ON search_results(video_id);
 
+-- Chỉ mục trigram cho bộ lọc LIKE '%username%' (bỏ qua nếu không có pg_trgm)
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_comments_username_trgm ON comments USING gin (username gin_trgm_ops);
+EXCEPTION WHEN insufficient_privilege OR undefined_file THEN
+    RAISE NOTICE 'pg_trgm không khả dụng, bỏ qua chỉ mục trigram';
+END
+$$;
+
 -- Tạo VIEW để dễ dàng truy vấn thống kê
 CREATE OR REPLACE VIEW video_stats AS
 SELECT 
@@ -1,8 +1,49 @@
+import os
 import streamlit as st
 from pathlib import Path
 import base64
+from typing import List
 from app.config.database_config import get_database_config
 
+# Định dạng file dữ liệu được liệt kê, theo thứ tự hiển thị
+DATA_FILE_SUFFIXES = ('.csv', '.json', '.xlsx')
+
+@st.cache_data(ttl=5)
+def _scan_data_files(dir_str: str, mtime_ns: int) -> List[Path]:
+    """
+    Quét thư mục dữ liệu một lần bằng os.scandir (kết quả được cache theo mtime của thư mục)
+    
+    Args:
+        dir_str (str): Đường dẫn thư mục
+        mtime_ns (int): mtime của thư mục, thay đổi khi thêm/xóa/đổi tên file
+        
+    Returns:
+        list: Các file dữ liệu, nhóm theo định dạng rồi theo tên
+    """
+    with os.scandir(dir_str) as entries:
+        files = [Path(entry.path) for entry in entries
+                 if entry.is_file() and entry.name.lower().endswith(DATA_FILE_SUFFIXES)]
+    return sorted(files, key=lambda f: (DATA_FILE_SUFFIXES.index(f.suffix.lower()), f.name))
+
+def list_data_files(data_dir: Path) -> List[Path]:
+    """
+    Liệt kê các file dữ liệu (CSV, JSON, Excel) trong thư mục
+    
+    Streamlit chạy lại script sau mỗi tương tác, nên kết quả quét được cache và chỉ quét
+    lại khi thư mục thay đổi (hoặc sau vài giây).
+    
+    Args:
+        data_dir (Path): Thư mục dữ liệu
+        
+    Returns:
+        list: Các file dữ liệu, danh sách rỗng nếu thư mục không tồn tại
+    """
+    try:
+        mtime_ns = data_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    return _scan_data_files(str(data_dir), mtime_ns)
+
 def render_sidebar():
     """
     Hiển thị sidebar cho ứng dụng
@@ -38,7 +79,7 @@ def render_sidebar():
     # Hiển thị thông tin đã thu thập (nếu có)
     data_dir = Path("data/raw")
     if data_dir.exists():
-        data_files = list(data_dir.glob("*.csv")) + list(data_dir.glob("*.json")) + list(data_dir.glob("*.xlsx"))
+        data_files = list_data_files(data_dir)
         if data_files:
             st.sidebar.subheader("Dữ liệu đã thu thập")
             st.sidebar.text(f"Số lượng file: {len(data_files)}")
@@ -13,24 +13,12 @@ from app.data.processor import basic_analysis
 from app.data.exporter import export_to_excel, export_to_csv, export_to_json
 from app.data.database import get_db_connector
 from app.config.database_config import get_database_config
+from app.ui.components.sidebar import list_data_files
 
 def display_captcha_ui():
     """Display a custom UI for captcha interaction"""
+    # Style của .captcha-container nằm trong ui/styles/custom.css (đã được main.load_css nạp)
     st.markdown("""
-    <style>
-    .captcha-container {
-        border: 2px solid #f0f0f0;
-        border-radius: 8px;
-        padding: 20px;
-        text-align: center;
-        background-color: #fffdee;
-    }
-    .captcha-icon {
-        font-size: 48px;
-        margin-bottom: 10px;
-    }
-    </style>
-    
     <div class="captcha-container">
         <div class="captcha-icon">🔒</div>
         <h2>Phát hiện bảo vệ CAPTCHA</h2>
@@ -71,100 +59,27 @@ def ensure_database_setup(db_config):
     if not db_config.get("db_enabled", False):
         return False
         
+    # Tạo kết nối
+    db = get_db_connector(db_config)
+    
     try:
-        # Tạo kết nối
-        db = get_db_connector(db_config)
-        
-        # Kiểm tra kết nối
-        if not db.connect():
-            logger.error("Không thể kết nối đến PostgreSQL server")
-            return False
-            
-        # Tạo database
-        if not db.create_database():
-            logger.error("Không thể tạo database")
-            return False
-            
-        # Kết nối đến database
-        if not db.connect_to_database():
+        # Kết nối đến database (tạo database nếu chưa tồn tại)
+        if not db.ensure_database():
             logger.error("Không thể kết nối đến database")
             return False
             
-        # Kiểm tra xem bảng videos đã tồn tại chưa
-        db.cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'videos'
-        )
-        """)
-        videos_exists = db.cursor.fetchone()[0]
-        
-        # Kiểm tra xem bảng comments đã tồn tại chưa
-        db.cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'comments'
-        )
-        """)
-        comments_exists = db.cursor.fetchone()[0]
-        
-        # Nếu một trong hai bảng không tồn tại, tạo lại cả hai
-        if not videos_exists or not comments_exists:
-            # Tạo bảng videos
-            db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS videos (
-                video_id VARCHAR(255) PRIMARY KEY,
-                video_url TEXT NOT NULL,
-                author VARCHAR(255),
-                title TEXT,
-                description TEXT,
-                views_count BIGINT,
-                likes_count BIGINT,
-                shares_count BIGINT,
-                comments_count BIGINT,
-                post_time VARCHAR(255),
-                music_name TEXT,
-                tags TEXT[],
-                crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
-            # Tạo bảng comments
-            db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS comments (
-                comment_id SERIAL PRIMARY KEY,
-                video_id VARCHAR(255) REFERENCES videos(video_id) ON DELETE CASCADE,
-                username VARCHAR(255) NOT NULL,
-                comment_text TEXT,
-                likes INTEGER DEFAULT 0,
-                comment_time VARCHAR(255),
-                replies_count INTEGER DEFAULT 0,
-                is_reply BOOLEAN DEFAULT FALSE,
-                parent_comment_id INTEGER,
-                avatar_url TEXT,
-                avatar_path TEXT,
-                crawled_at TIMESTAMP
-            )
-            """)
-            
-            # Tạo các chỉ mục
-            db.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);
-            CREATE INDEX IF NOT EXISTS idx_comments_username ON comments(username);
-            """)
-            
-            # Commit các thay đổi
-            db.conn.commit()
-            logger.info("Đã tạo các bảng cần thiết trong database")
+        # Tạo bảng và chỉ mục nếu còn thiếu (một truy vấn kiểm tra, DDL gửi trong một lần)
+        if not db.create_tables():
+            logger.error("Không thể tạo các bảng cần thiết trong database")
+            return False
             
-        db.close()
         return True
         
     except Exception as e:
         logger.error(f"Lỗi khi thiết lập database: {e}")
         return False
+    finally:
+        db.close()
     
 def filter_duplicate_comments(comments_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -176,18 +91,12 @@ def filter_duplicate_comments(comments_data: List[Dict[str, Any]]) -> List[Dict[
     Returns:
         list: Danh sách các bình luận không trùng lặp
     """
-    # Sử dụng set để lưu trữ các comment đã xử lý
-    processed_comments = set()
-    unique_comments = []
-    
+    # Khóa (username, nội dung comment): tuple băm trực tiếp từng phần tử, không phải
+    # ghép thành chuỗi mới. setdefault giữ lại comment xuất hiện đầu tiên theo thứ tự
+    unique = {}
     for comment in comments_data:
-        # Tạo một khóa duy nhất dựa trên username và nội dung comment
-        comment_key = f"{comment.get('username', '')}:{comment.get('comment_text', '')}"
-        
-        # Nếu comment chưa tồn tại, thêm vào danh sách kết quả
-        if comment_key not in processed_comments:
-            processed_comments.add(comment_key)
-            unique_comments.append(comment)
+        unique.setdefault((comment.get('username', ''), comment.get('comment_text', '')), comment)
+    unique_comments = list(unique.values())
     
     logger.info(f"Đã lọc bỏ {len(comments_data) - len(unique_comments)} bình luận trùng lặp")
     return unique_comments
@@ -200,9 +109,16 @@ def render_crawler_page():
     db_enabled = db_config.get("db_enabled", False)
     auto_save_to_db = db_config.get("auto_save_to_db", False)
     
-    # Kiểm tra và thiết lập database nếu cần
+    # Kiểm tra và thiết lập database nếu cần (chỉ một lần cho mỗi cấu hình trong phiên;
+    # trang được chạy lại sau mỗi thao tác trên giao diện)
     if db_enabled:
-        db_status = ensure_database_setup(db_config)
+        cfg_key = hash(tuple(sorted(db_config.items())))
+        db_status = st.session_state.get('_db_setup_key') == cfg_key
+        if not db_status:
+            db_status = ensure_database_setup(db_config)
+            # Chỉ ghi nhớ khi thành công để lần chạy sau thử lại nếu database chưa sẵn sàng
+            if db_status:
+                st.session_state['_db_setup_key'] = cfg_key
         if not db_status:
             st.warning("Database chưa được thiết lập đúng cách. Vui lòng kiểm tra lại cài đặt Database trong trang Settings.")
 
@@ -479,22 +395,21 @@ def render_crawler_page():
                     # Lưu dữ liệu
                     update_progress(90, f"Đang lưu {len(comments_data)} bình luận...")
                     
+                    # Chuyển đổi thành DataFrame một lần, dùng chung cho xuất file, database và phân tích
+                    df = pd.DataFrame(comments_data)
+                    
                     success = False
                     if output_format == "CSV":
                         success = crawler.save_to_csv(comments_data, output_file=output_file)
                     elif output_format == "JSON":
                         success = crawler.save_to_json(comments_data, output_file=output_file)
                     else:  # Excel
-                        df = pd.DataFrame(comments_data)
                         success = export_to_excel(df, output_file)
                     
                     # Lưu vào database nếu được yêu cầu
                     if success and db_enabled and save_to_db:
                         update_progress(95, "Đang lưu dữ liệu vào PostgreSQL...")
                         
-                        # Chuyển đổi thành DataFrame
-                        df = pd.DataFrame(comments_data)
-                        
                         # Lấy kết nối database
                         db = get_db_connector(db_config)
                         
@@ -521,7 +436,6 @@ def render_crawler_page():
                         st.success(f"Đã lưu {len(comments_data)} bình luận vào: {output_file}")
                         
                         # Hiển thị dữ liệu
-                        df = pd.DataFrame(comments_data)
                         st.subheader("Xem trước dữ liệu")
                         st.dataframe(df.head(10))
                         
@@ -529,9 +443,13 @@ def render_crawler_page():
                         if len(comments_data) > 0:
                             st.subheader("Phân tích cơ bản")
                             
-                            # Phân tách comments chính và replies
-                            main_comments = [c for c in comments_data if not c.get('is_reply', False)]
-                            replies = [c for c in comments_data if c.get('is_reply', False)]
+                            # Phân tách comments chính và replies bằng mặt nạ boolean trên DataFrame
+                            if 'is_reply' in df.columns:
+                                is_reply = df['is_reply'].fillna(False).astype(bool)
+                            else:
+                                is_reply = pd.Series(False, index=df.index)
+                            main_df = df.loc[~is_reply]
+                            replies_count = int(is_reply.sum())
                             
                             col_a, col_b, col_c = st.columns(3)
                             
@@ -539,14 +457,14 @@ def render_crawler_page():
                                 st.metric("Tổng số bình luận", len(comments_data))
                                 
                             with col_b:
-                                st.metric("Bình luận chính", len(main_comments))
+                                st.metric("Bình luận chính", len(main_df))
                                 
                             with col_c:
-                                st.metric("Trả lời", len(replies))
+                                st.metric("Trả lời", replies_count)
                             
                             # Phân tích thêm nếu có đủ dữ liệu
-                            if len(main_comments) > 5:
-                                analysis_results = basic_analysis(pd.DataFrame(main_comments))
+                            if len(main_df) > 5:
+                                analysis_results = basic_analysis(main_df)
                                 
                                 col_d, col_e = st.columns(2)
                                 
@@ -807,15 +725,14 @@ def render_crawler_page():
                                 try:
                                     # Kết nối đến database
                                     if db.connect_to_database():
-                                        # Lưu từng video vào database
-                                        success_count = 0
-                                        for video in selected_video_data:
-                                            video_id = video['video_id']
-                                            video_comments = df[df['video_id'] == video_id]
-                                            
-                                            if not video_comments.empty:
-                                                if db.export_dataframe_to_postgres(video_comments, video_id, video['video_url']):
-                                                    success_count += 1
+                                        # Lưu các video vào database song song, mỗi video một kết nối
+                                        comments_by_video = dict(tuple(df.groupby('video_id')))
+                                        items = [
+                                            (comments_by_video[video['video_id']], video['video_id'], video['video_url'], None)
+                                            for video in selected_video_data
+                                            if video['video_id'] in comments_by_video
+                                        ]
+                                        success_count = db.bulk_export_dataframes(items)
                                         
                                         if success_count > 0:
                                             st.success(f"Đã lưu dữ liệu vào PostgreSQL cho {success_count}/{len(selected_video_data)} video!")
@@ -834,10 +751,10 @@ def render_crawler_page():
                         else:
                             st.warning("Không thu thập được bình luận nào từ các video đã chọn.")
             if db_enabled and videos is not None:
+                # Lấy kết nối database
+                db = get_db_connector(db_config)
+                
                 try:
-                    # Lấy kết nối database
-                    db = get_db_connector(db_config)
-                    
                     if db.connect_to_database():
                         # Lưu kết quả tìm kiếm
                         if db.save_search_results(search_keyword, videos):
@@ -846,11 +763,11 @@ def render_crawler_page():
                             st.warning(f"Không thể lưu kết quả tìm kiếm vào database.")
                     else:
                         st.warning(f"Không thể kết nối đến database.")
-                        
-                    # Đóng kết nối
-                    db.close()
                 except Exception as e:
                     st.warning(f"Lỗi khi lưu kết quả tìm kiếm: {str(e)}")
+                finally:
+                    # Đóng kết nối
+                    db.close()
 
     
     # Giai đoạn 3: Kết thúc
@@ -862,7 +779,7 @@ def render_crawler_page():
         # Hiển thị các file đã thu thập
         data_dir = Path("data/raw")
         if data_dir.exists():
-            data_files = list(data_dir.glob("*.csv")) + list(data_dir.glob("*.json")) + list(data_dir.glob("*.xlsx"))
+            data_files = list_data_files(data_dir)
             
             if data_files:
                 st.subheader("📁 File dữ liệu đã thu thập")
@@ -8,10 +8,11 @@ import seaborn as sns
 import plotly.express as px
 import re
 from app.data.processor import clean_data, basic_analysis, sentiment_analysis, extract_hashtags, get_popular_hashtags
-from app.data.exporter import export_to_excel, export_to_csv, export_to_json
+from app.data.exporter import export_to_excel, export_to_csv, export_to_json, export_to_parquet, export_parquet_many
 from app.data.database import get_db_connector
 from app.config.database_config import get_database_config
 from app.utils.helpers import get_video_id_from_url
+from app.ui.components.sidebar import list_data_files
 
 def render_data_view_page():
     """
@@ -26,7 +27,7 @@ def render_data_view_page():
     if not selected_file:
         data_dir = Path("data/raw")
         if data_dir.exists():
-            data_files = list(data_dir.glob("*.csv")) + list(data_dir.glob("*.json")) + list(data_dir.glob("*.xlsx"))
+            data_files = list_data_files(data_dir)
             
             if data_files:
                 file_options = [file.name for file in data_files]
@@ -190,7 +191,7 @@ def render_data_view_page():
     st.markdown("---")
     st.subheader("📤 Xuất dữ liệu")
     
-    col1, col2, col3, col4 = st.columns([1, 1, 1, 1.5])
+    col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1.5])
     
     with col1:
         if st.button("📄 Xuất CSV", use_container_width=True):
@@ -228,10 +229,32 @@ def render_data_view_page():
             else:
                 st.error("Lỗi khi xuất dữ liệu.")
     
+    with col4:
+        sharded = st.checkbox(
+            "Xuất nhanh (chia nhỏ)",
+            help="Ghi song song thành nhiều file Parquet trong một thư mục, phù hợp với dữ liệu lớn"
+        )
+        if st.button("🗜️ Xuất Parquet", use_container_width=True):
+            if sharded:
+                # Thư mục chứa các phần part-*.parquet
+                export_path = file_path.parent.parent / "processed" / f"{file_path.stem}_processed_parquet"
+                exported = export_parquet_many(df_clean, export_path)
+            else:
+                # Tạo đường dẫn file xuất
+                export_path = file_path.parent.parent / "processed" / f"{file_path.stem}_processed.parquet"
+                export_path.parent.mkdir(parents=True, exist_ok=True)
+                exported = export_to_parquet(df_clean, export_path)
+            
+            # Xuất file
+            if exported:
+                st.success(f"Đã xuất dữ liệu sang: {export_path}")
+            else:
+                st.error("Lỗi khi xuất dữ liệu.")
+    
     # Kiểm tra nếu tính năng database được bật
     db_config = get_database_config()
     if db_config["db_enabled"]:
-        with col4:
+        with col5:
             # Nút xuất vào PostgreSQL
             if st.button("🐘 Xuất vào PostgreSQL", use_container_width=True):
                 # Yêu cầu URL của video
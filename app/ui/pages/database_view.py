@@ -366,6 +366,7 @@ def render_database_view_page():
                 if confirm:
                     try:
                         db.cursor.execute("DELETE FROM comments")
+                        db.invalidate_caches()
                         st.success("Đã xóa tất cả bình luận!")
                     except Exception as e:
                         st.error(f"Lỗi khi xóa bình luận: {str(e)}")
@@ -377,8 +378,8 @@ def render_database_view_page():
                 if confirm:
                     try:
                         # Xóa comments trước vì có foreign key
-                        db.cursor.execute("DELETE FROM comments")
-                        db.cursor.execute("DELETE FROM videos")
+                        db.execute_script(["DELETE FROM comments", "DELETE FROM videos"])
+                        db.invalidate_caches()
                         st.success("Đã xóa toàn bộ dữ liệu!")
                     except Exception as e:
                         st.error(f"Lỗi khi xóa dữ liệu: {str(e)}")
@@ -390,8 +391,8 @@ def render_database_view_page():
                 if confirm:
                     try:
                         # Xóa các bảng cũ
-                        db.cursor.execute("DROP TABLE IF EXISTS comments")
-                        db.cursor.execute("DROP TABLE IF EXISTS videos")
+                        db.execute_script(["DROP TABLE IF EXISTS comments", "DROP TABLE IF EXISTS videos"])
+                        db.invalidate_caches()
                         
                         # Tạo lại các bảng
                         if db.create_tables():
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 import os
+from app.ui.components.sidebar import list_data_files
 
 def render_home_page():
     """
@@ -46,7 +47,7 @@ def render_home_page():
     
     data_dir = Path("data/raw")
     if data_dir.exists():
-        data_files = list(data_dir.glob("*.csv")) + list(data_dir.glob("*.json")) + list(data_dir.glob("*.xlsx"))
+        data_files = list_data_files(data_dir)
         
         if data_files:
             st.subheader("📁 Thống kê dữ liệu")
@@ -270,11 +270,13 @@ def render_settings_page():
                     })
                     
                     # Thử kết nối
-                    if db.connect():
-                        st.success("✅ Kết nối thành công đến PostgreSQL server!")
+                    try:
+                        if db.connect():
+                            st.success("✅ Kết nối thành công đến PostgreSQL server!")
+                        else:
+                            st.error("❌ Không thể kết nối đến PostgreSQL server!")
+                    finally:
                         db.close()
-                    else:
-                        st.error("❌ Không thể kết nối đến PostgreSQL server!")
             
             # Nút thiết lập database
             if st.button("🛠️ Thiết lập database", use_container_width=False):
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "integration: cần PostgreSQL thật (đặt PGHOST/PGUSER/PGPASSWORD/PGDATABASE)"
+    )
+
+
+@pytest.fixture
+def pg_config():
+    """Cấu hình database cho test tích hợp, lấy từ biến môi trường PG*"""
+    if not os.environ.get("PGHOST"):
+        pytest.skip("Chưa đặt PGHOST, bỏ qua test tích hợp PostgreSQL")
+    return {
+        "db_host": os.environ["PGHOST"],
+        "db_port": int(os.environ.get("PGPORT", 5432)),
+        "db_user": os.environ.get("PGUSER", "postgres"),
+        "db_password": os.environ.get("PGPASSWORD", ""),
+        "db_name": os.environ.get("PGDATABASE", "tiktok_data_test"),
+    }
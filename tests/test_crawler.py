@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("selenium")
+pytest.importorskip("psycopg2")
+
+from app.ui.pages.crawler import filter_duplicate_comments
+
+
+def test_filter_duplicate_comments_keeps_first_occurrence():
+    comments = [
+        {"username": "alice", "comment_text": "hay quá", "likes": "1"},
+        {"username": "bob", "comment_text": "hay quá", "likes": "2"},
+        {"username": "alice", "comment_text": "hay quá", "likes": "3"},
+        {"username": "alice", "comment_text": "đỉnh", "likes": "4"},
+    ]
+    
+    result = filter_duplicate_comments(comments)
+    
+    assert [c["likes"] for c in result] == ["1", "2", "4"]
+
+
+def test_filter_duplicate_comments_key_is_not_joined_string():
+    # Khóa ghép "username:comment_text" coi hai bình luận này là trùng nhau
+    comments = [
+        {"username": "a:b", "comment_text": "c"},
+        {"username": "a", "comment_text": "b:c"},
+    ]
+    
+    assert filter_duplicate_comments(comments) == comments
+
+
+def test_filter_duplicate_comments_missing_fields():
+    comments = [{"likes": "1"}, {"username": "", "comment_text": ""}, {"username": "alice"}]
+    
+    result = filter_duplicate_comments(comments)
+    
+    assert result == [{"likes": "1"}, {"username": "alice"}]
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from app.data.exporter import export_parquet_many, export_to_csv, export_to_json, export_to_parquet
+
+
+@pytest.fixture
+def comments_df():
+    return pd.DataFrame({
+        "username": ["alice", "bình", "carol"],
+        "comment_text": ['hay quá, "đỉnh"', "dòng 1\ndòng 2", None],
+        "likes": ["1.2K", "15", "0"],
+        "likes_count": [1200, 15, 0],
+        "is_reply": [False, True, False],
+        "score": [0.5, 1.0, float("nan")],
+        "crawled_at": pd.to_datetime(["2024-01-02 03:04:05", "2024-01-02 03:04:06", None]),
+    })
+
+
+def test_export_to_csv_matches_pandas_output(tmp_path, comments_df):
+    exported = tmp_path / "out" / "comments.csv"
+    expected = tmp_path / "expected.csv"
+    
+    assert export_to_csv(comments_df, exported)
+    comments_df.to_csv(expected, index=False, encoding="utf-8-sig")
+    
+    assert exported.read_bytes() == expected.read_bytes()
+
+
+def test_export_to_csv_round_trip(tmp_path, comments_df):
+    exported = tmp_path / "comments.csv"
+    assert export_to_csv(comments_df, exported)
+    
+    # data_view đọc lại file bằng pd.read_csv(file_path)
+    df = pd.read_csv(exported)
+    
+    assert list(df.columns) == list(comments_df.columns)
+    assert df["username"].tolist() == comments_df["username"].tolist()
+    assert df["comment_text"].tolist()[:2] == comments_df["comment_text"].tolist()[:2]
+    assert pd.isna(df["comment_text"].iloc[2])
+    assert df["likes_count"].tolist() == [1200, 15, 0]
+    assert df["is_reply"].tolist() == [False, True, False]
+    assert pd.to_datetime(df["crawled_at"]).equals(comments_df["crawled_at"])
+
+
+def test_export_to_json_records(tmp_path, comments_df):
+    exported = tmp_path / "comments.json"
+    assert export_to_json(comments_df, exported)
+    
+    text = exported.read_text(encoding="utf-8")
+    records = json.loads(text)
+    
+    # force_ascii=False: tiếng Việt được ghi nguyên dạng
+    assert "bình" in text
+    assert len(records) == 3
+    assert records[1]["username"] == "bình"
+    assert records[0]["likes_count"] == 1200
+    assert records[0]["crawled_at"].startswith("2024-01-02T03:04:05")
+    assert records[2]["comment_text"] is None
+    assert records[2]["crawled_at"] is None
+
+
+def test_export_to_parquet_round_trip(tmp_path, comments_df):
+    pytest.importorskip("pyarrow")
+    exported = tmp_path / "out" / "comments.parquet"
+    assert export_to_parquet(comments_df, exported)
+    
+    pd.testing.assert_frame_equal(pd.read_parquet(exported), comments_df)
+
+
+def _read_parts(output_dir):
+    return pd.concat(
+        [pd.read_parquet(part) for part in sorted(output_dir.glob("part-*.parquet"))],
+        ignore_index=True
+    )
+
+
+def test_export_parquet_many_round_trip(tmp_path, comments_df):
+    pytest.importorskip("pyarrow")
+    output_dir = tmp_path / "out" / "shards"
+    assert export_parquet_many(comments_df, output_dir, shards=2)
+    
+    assert sorted(p.name for p in output_dir.iterdir()) == ["part-0000.parquet", "part-0001.parquet"]
+    pd.testing.assert_frame_equal(_read_parts(output_dir), comments_df)
+    # Không để lại thư mục tạm cạnh thư mục đầu ra
+    assert [p.name for p in output_dir.parent.iterdir()] == ["shards"]
+
+
+def test_export_parquet_many_replaces_previous_export(tmp_path, comments_df):
+    pytest.importorskip("pyarrow")
+    output_dir = tmp_path / "shards"
+    assert export_parquet_many(comments_df, output_dir, shards=3)
+    assert export_parquet_many(comments_df.head(1), output_dir, shards=1)
+    
+    assert [p.name for p in output_dir.iterdir()] == ["part-0000.parquet"]
+    pd.testing.assert_frame_equal(_read_parts(output_dir), comments_df.head(1))
+
+
+def test_export_parquet_many_refuses_directory_with_other_files(tmp_path, comments_df):
+    output_dir = tmp_path / "shards"
+    output_dir.mkdir()
+    (output_dir / "notes.txt").write_text("keep me")
+    
+    assert not export_parquet_many(comments_df, output_dir, shards=2)
+    
+    assert [p.name for p in output_dir.iterdir()] == ["notes.txt"]
+
+
+def test_export_parquet_many_failure_keeps_previous_export(tmp_path, comments_df):
+    pytest.importorskip("pyarrow")
+    output_dir = tmp_path / "shards"
+    assert export_parquet_many(comments_df, output_dir, shards=2)
+    
+    # pyarrow không ghi được cột chứa đối tượng Python tùy ý
+    broken = comments_df.assign(extra=[object()] * len(comments_df))
+    assert not export_parquet_many(broken, output_dir, shards=2)
+    
+    pd.testing.assert_frame_equal(_read_parts(output_dir), comments_df)
+    assert [p.name for p in tmp_path.iterdir()] == ["shards"]
@@ -0,0 +1,154 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+from app.data.processor import (
+    basic_analysis,
+    clean_data,
+    extract_hashtags,
+    get_popular_hashtags,
+    parse_counts,
+    sentiment_analysis,
+)
+
+
+@pytest.fixture
+def comments_df():
+    return pd.DataFrame({
+        "username": [" alice ", "bob", "alice", "carol"],
+        "comment_text": ["video hay quá 👍 #fyp", "chán quá #fyp #xuhuong", "bình thường", None],
+        "likes": ["1.2K", "15", "0", None],
+        "replies_count": ["2", "1M", "", "3"],
+        "comment_time": [" 1 giờ trước", "2 giờ trước ", "3 giờ trước", "4 giờ trước"],
+    })
+
+
+def test_parse_counts_suffixes():
+    values = pd.Series(["1.2K", "2.01M", "3B", "15", " 4.5 m ", "abc", "", None])
+    
+    result = parse_counts(values)
+    
+    assert result.dtype == "int64"
+    assert result.tolist() == [1200, 2010000, 3000000000, 15, 4500000, 0, 0, 0]
+
+
+def test_parse_counts_numeric_column():
+    result = parse_counts(pd.Series([1, 2.0, float("nan")]))
+    
+    assert result.dtype == "int64"
+    assert result.tolist() == [1, 2, 0]
+
+
+def test_clean_data_adds_derived_columns(comments_df):
+    df_clean = clean_data(comments_df)
+    
+    assert df_clean["likes_count"].tolist() == [1200, 15, 0, 0]
+    assert df_clean["replies_number"].tolist() == [2, 1000000, 0, 3]
+    assert df_clean["comment_length"].dtype == np.int32
+    assert df_clean["comment_length"].tolist() == [20, 22, 11, 0]
+    assert df_clean["username"].tolist() == ["alice", "bob", "alice", "carol"]
+    assert df_clean["comment_time"].tolist()[:2] == ["1 giờ trước", "2 giờ trước"]
+
+
+@pytest.fixture
+def without_copy_on_write():
+    # main.py bật Copy-on-Write, nhưng processor cũng được import mà không qua main.py
+    if int(pd.__version__.split(".")[0]) >= 3:
+        yield
+        return
+    with pd.option_context("mode.copy_on_write", False):
+        yield
+
+
+def test_clean_data_does_not_modify_input(comments_df, without_copy_on_write):
+    original = comments_df.copy()
+    
+    df_clean = clean_data(comments_df)
+    df_clean["username"] = "changed"
+    
+    pd.testing.assert_frame_equal(comments_df, original)
+
+
+def test_extract_hashtags(comments_df):
+    df = extract_hashtags(comments_df)
+    
+    # Bình luận thiếu (None/NaN) cho ra danh sách rỗng, không phải NaN
+    assert df["hashtags"].tolist() == [["fyp"], ["fyp", "xuhuong"], [], []]
+
+
+def test_extract_hashtags_missing_comment_text():
+    df = pd.DataFrame({"username": ["a", "b"], "comment_text": [np.nan, "#one"]})
+    
+    assert extract_hashtags(df)["hashtags"].tolist() == [[], ["one"]]
+
+
+def test_analysis_on_cleaned_frame_does_not_modify_it(comments_df):
+    df_clean = clean_data(comments_df)
+    columns = list(df_clean.columns)
+    
+    sentiment_analysis(df_clean)
+    extract_hashtags(df_clean)
+    
+    assert list(df_clean.columns) == columns
+
+
+def test_basic_analysis_on_column_subset_of_cleaned_frame(comments_df):
+    # DataFrame dẫn xuất từ df đã làm sạch nhưng thiếu cột comment_length phải được làm sạch lại
+    subset = clean_data(comments_df)[["username", "comment_text"]]
+    
+    results = basic_analysis(subset)
+    
+    assert results["avg_comment_length"] == pytest.approx((20 + 22 + 11 + 0) / 4)
+    assert results["avg_likes"] == 0
+
+
+def test_sentiment_analysis_labels():
+    df = pd.DataFrame({
+        "username": ["a", "b", "c", "d", "e", "f"],
+        "comment_text": ["video hay quá 👍", "chán quá", "bình thường", "HAY QUÁ", "hay nhưng chán", None],
+    })
+    
+    result = sentiment_analysis(df)
+    
+    assert result["sentiment"].tolist() == [
+        "positive", "negative", "neutral", "positive", "neutral", "neutral"
+    ]
+
+
+def test_get_popular_hashtags(comments_df):
+    popular = get_popular_hashtags(comments_df, top_n=1)
+    
+    assert popular.dtype == "int64"
+    assert popular.to_dict() == {"fyp": 2}
+
+
+def test_get_popular_hashtags_without_hashtags():
+    df = pd.DataFrame({"username": ["a"], "comment_text": ["không có hashtag"]})
+    
+    assert get_popular_hashtags(df).empty
+
+
+def test_basic_analysis_comment_length_dist(comments_df):
+    results = basic_analysis(comments_df)
+    
+    dist = results["comment_length_dist"]
+    assert dist.index.name == "Độ dài"
+    assert dist.index.tolist()[:2] == ["0-50", "50-100"]
+    assert len(dist) == 10
+    assert dist["Số lượng"].sum() == len(comments_df)
+    assert dist["Số lượng"].iloc[0] == len(comments_df)
+    assert results["avg_comment_length"] == pytest.approx((20 + 22 + 11 + 0) / 4)
+
+
+def test_basic_analysis_top_users(comments_df):
+    results = basic_analysis(comments_df)
+    
+    assert results["unique_users"] == 3
+    assert results["avg_likes"] == pytest.approx((1200 + 15 + 0 + 0) / 4)
+    
+    top_users = results["top_users"]
+    assert top_users.index.name == "Người dùng"
+    assert list(top_users.columns) == ["Số bình luận"]
+    assert top_users.index[0] == "alice"
+    assert top_users["Số bình luận"].iloc[0] == 2
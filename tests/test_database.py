@@ -0,0 +1,247 @@
+import struct
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pd = pytest.importorskip("pandas")
+
+from app.data.database import (
+    _INT4_MAX,
+    _pack_binary_copy,
+    _pool_key,
+    _to_timestamps,
+    PostgresConnector,
+    get_db_connector,
+)
+
+VIDEO_ID = "pytest_video"
+
+
+def test_to_timestamps_mixed_formats():
+    values = pd.Series(
+        ["2024-01-02 03:04:05", "2024-01-02T03:04:06.123456", "2024-01-02 03:04", None, "không rõ"],
+        dtype=object
+    )
+    
+    result = _to_timestamps(values).tolist()
+    
+    assert result[:3] == [
+        datetime(2024, 1, 2, 3, 4, 5),
+        datetime(2024, 1, 2, 3, 4, 6, 123456),
+        datetime(2024, 1, 2, 3, 4),
+    ]
+    assert result[3:] == [None, None]
+
+
+def test_to_timestamps_keeps_datetimes():
+    values = pd.Series([datetime(2024, 1, 2, 3, 4, 5), None], dtype=object)
+    
+    assert _to_timestamps(values).tolist() == [datetime(2024, 1, 2, 3, 4, 5), None]
+
+
+def test_pack_binary_copy_layout():
+    data = _pack_binary_copy(
+        [(1, "\\N", None, True, datetime(2000, 1, 1, 0, 0, 1)), (float("nan"), "", 2, False, None)],
+        ("int4", "text", "int8", "bool", "timestamp")
+    )
+    
+    assert data == (
+        b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+        + struct.pack(">h", 5)
+        + struct.pack(">ii", 4, 1)
+        + struct.pack(">i", 2) + b"\\N"
+        + struct.pack(">i", -1)
+        + struct.pack(">i?", 1, True)
+        + struct.pack(">iq", 8, 1000000)
+        + struct.pack(">h", 5)
+        + struct.pack(">i", -1)
+        + struct.pack(">i", 0)
+        + struct.pack(">iq", 8, 2)
+        + struct.pack(">i?", 1, False)
+        + struct.pack(">i", -1)
+        + struct.pack(">h", -1)
+    )
+
+
+def test_pool_key_depends_on_password():
+    key = _pool_key("localhost", 5432, "postgres", "secret", "tiktok_data")
+    
+    assert key != _pool_key("localhost", 5432, "postgres", "changed", "tiktok_data")
+    assert key == _pool_key("localhost", 5432, "postgres", "secret", "tiktok_data")
+    assert "secret" not in key
+
+
+@pytest.fixture
+def db(pg_config):
+    connector = get_db_connector(pg_config)
+    assert connector.ensure_database()
+    assert connector.create_tables()
+    assert connector.insert_video(VIDEO_ID, "https://www.tiktok.com/@pytest/video/1")
+    yield connector
+    connector.cursor.execute("DELETE FROM videos WHERE video_id = %s", (VIDEO_ID,))
+    connector.close()
+
+
+@pytest.mark.integration
+def test_iter_comments_break_early_does_not_leave_transaction(db):
+    comments = [
+        {"username": f"user{i}", "comment_text": f"comment {i}", "likes": "1.2K"}
+        for i in range(5)
+    ]
+    assert db.insert_comments(VIDEO_ID, comments)
+    
+    for row in db.iter_comments(video_id=VIDEO_ID):
+        assert row["video_id"] == VIDEO_ID
+        break
+    
+    # Các lệnh ghi sau đó không bị lồng vào transaction chỉ đọc của generator
+    assert not db._in_transaction
+    assert db.conn.autocommit
+    assert db.insert_video(VIDEO_ID, "https://www.tiktok.com/@pytest/video/2", title="updated")
+    assert len(db.query_comments(video_id=VIDEO_ID)) == 5
+
+
+@pytest.mark.integration
+def test_iter_comments_abandoned_generator_does_not_block_writes(db):
+    assert db.insert_comments(VIDEO_ID, [{"username": "a", "comment_text": "x"},
+                                         {"username": "b", "comment_text": "y"}])
+    
+    rows = db.iter_comments(video_id=VIDEO_ID)
+    next(rows)
+    
+    # Generator vẫn còn tham chiếu nhưng chưa duyệt hết
+    assert db.insert_comments(VIDEO_ID, [{"username": "c", "comment_text": "z"}])
+    assert len(list(rows)) == 1
+    assert len(db.query_comments(video_id=VIDEO_ID)) == 3
+
+
+def _all_pages(db, limit):
+    pages, after = [], None
+    while True:
+        rows = db.query_comments(video_id=VIDEO_ID, limit=limit, after=after)
+        if not rows:
+            return pages
+        pages.append([row["comment_id"] for row in rows])
+        after = (rows[-1]["crawled_at"], rows[-1]["comment_id"])
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("timestamps", [
+    [None] * 6,
+    ["2024-01-02 03:04:05", None, "2024-01-02 03:04:07", None, "2024-01-02 03:04:05", None],
+])
+def test_query_comments_keyset_pages_reach_null_crawled_at(db, timestamps):
+    comments = [
+        {"username": f"user{i}", "comment_text": f"comment {i}", "crawled_at": ts}
+        for i, ts in enumerate(timestamps)
+    ]
+    assert db.insert_comments(VIDEO_ID, comments)
+    
+    expected = [row["comment_id"] for row in db.query_comments(video_id=VIDEO_ID, limit=100)]
+    pages = _all_pages(db, limit=2)
+    
+    assert len(expected) == 6
+    assert [comment_id for page in pages for comment_id in page] == expected
+    assert all(len(page) == 2 for page in pages)
+
+
+@pytest.mark.integration
+def test_free_pool_slots_tracks_checked_out_connections(db, pg_config):
+    free = db._free_pool_slots()
+    
+    other = get_db_connector(pg_config)
+    assert other.connect_to_database()
+    try:
+        assert db._free_pool_slots() == free - 1
+    finally:
+        other.close()
+    
+    assert db._free_pool_slots() == free
+
+
+# Bình luận mẫu: reply trỏ tới comment gốc theo username, nội dung đúng bằng "\\N",
+# lượt thích vượt quá INTEGER và một bình luận trùng lặp
+SAMPLE_COMMENTS = [
+    {"username": "alice", "comment_text": "hay quá", "likes": "1.2K", "replies_count": "1",
+     "is_reply": False, "crawled_at": "2024-01-02 03:04:05"},
+    {"username": "bob", "comment_text": "\\N", "likes": "3B", "is_reply": False,
+     "crawled_at": "2024-01-02T03:04:06.123456"},
+    {"username": "carol", "comment_text": "đồng ý", "likes": "5", "is_reply": True,
+     "parent_comment_username": "alice"},
+    {"username": "alice", "comment_text": "hay quá", "likes": "1"},
+]
+
+EXPECTED_ROWS = [
+    ("alice", "hay quá", 1200, False, None, datetime(2024, 1, 2, 3, 4, 5)),
+    ("bob", "\\N", _INT4_MAX, False, None, datetime(2024, 1, 2, 3, 4, 6, 123456)),
+    ("carol", "đồng ý", 5, True, "alice", None),
+]
+
+
+def _stored_comments(db):
+    db.cursor.execute("""
+    SELECT c.username, c.comment_text, c.likes, c.is_reply, p.username, c.crawled_at
+    FROM comments c
+    LEFT JOIN comments p ON p.comment_id = c.parent_comment_id
+    WHERE c.video_id = %s
+    ORDER BY c.username, c.comment_text
+    """, (VIDEO_ID,))
+    return db.cursor.fetchall()
+
+
+@pytest.mark.integration
+def test_insert_comments_binary_copy(db):
+    assert db.insert_comments(VIDEO_ID, SAMPLE_COMMENTS)
+    
+    assert _stored_comments(db) == EXPECTED_ROWS
+    
+    # Lần thêm thứ hai bỏ qua các bình luận đã có trong database
+    assert db.insert_comments(VIDEO_ID, SAMPLE_COMMENTS)
+    assert _stored_comments(db) == EXPECTED_ROWS
+
+
+@pytest.mark.integration
+def test_insert_comments_without_copy(db):
+    assert db.insert_comments(VIDEO_ID, SAMPLE_COMMENTS, use_copy=False)
+    
+    assert _stored_comments(db) == EXPECTED_ROWS
+
+
+@pytest.mark.integration
+def test_insert_comments_falls_back_when_copy_fails(db, monkeypatch):
+    def failing_copy(self, parent_rows, reply_rows, username_to_id):
+        raise ValueError("COPY không khả dụng")
+    
+    monkeypatch.setattr(PostgresConnector, "_copy_comment_rows", failing_copy)
+    
+    assert db.insert_comments(VIDEO_ID, SAMPLE_COMMENTS)
+    
+    # Savepoint được quay lại nên không có dòng nào bị thêm hai lần
+    assert _stored_comments(db) == EXPECTED_ROWS
+
+
+@pytest.mark.integration
+def test_export_dataframe_fast_staging(db):
+    df = pd.DataFrame(SAMPLE_COMMENTS)
+    
+    assert db.export_dataframe_fast(df, VIDEO_ID, "https://www.tiktok.com/@pytest/video/1")
+    
+    assert _stored_comments(db) == EXPECTED_ROWS
+    
+    # Xuất lại cùng DataFrame không tạo thêm comment gốc trùng lặp
+    assert db.export_dataframe_fast(df, VIDEO_ID, "https://www.tiktok.com/@pytest/video/1")
+    roots = [row for row in _stored_comments(db) if not row[3]]
+    assert roots == [row for row in EXPECTED_ROWS if not row[3]]
+
+
+@pytest.mark.integration
+def test_export_dataframe_fast_missing_columns(db):
+    df = pd.DataFrame({"username": ["dave", None], "comment_text": ["chỉ có nội dung", "không tên"]})
+    
+    assert db.export_dataframe_fast(df, VIDEO_ID, "https://www.tiktok.com/@pytest/video/1")
+    
+    assert _stored_comments(db) == [
+        ("", "không tên", 0, False, None, None),
+        ("dave", "chỉ có nội dung", 0, False, None, None),
+    ]